@@ -4,11 +4,13 @@ Inbox Flow - Email Management System
 
 import streamlit as st
 from config.settings import settings
-from models.database import Database
+from models.database import get_db
 from ui.email_list import render_email_list
 from ui.prompt_config import render_prompt_config
 from ui.email_chat import render_email_chat
 from ui.draft_editor import render_draft_editor
+from utils.log import setup_logging
+from utils.request_cache import clear_request_cache
 
 
 # Page configuration
@@ -20,17 +22,32 @@ st.set_page_config(
 )
 
 
+# Static UI layout, built once rather than on every rerun
+_TAB_NAMES = ("Inbox", "Assistant", "Drafts", "Settings")
+
+
 def initialize_app():
     """Setup app state"""
-    db = Database()
+    get_db()
     
-    if 'initialized' not in st.session_state:
-        st.session_state.initialized = True
-        st.session_state.selected_email = None
-        st.session_state.selected_draft = None
-        st.session_state.chat_history = []
-        st.session_state.emails_loaded = False
-        st.session_state.active_tab = 0
+    st.session_state.setdefault('initialized', True)
+    st.session_state.setdefault('selected_email_id', None)
+    st.session_state.setdefault('selected_draft', None)
+    st.session_state.setdefault('chat_history', [])
+    st.session_state.setdefault('emails_loaded', False)
+    st.session_state.setdefault('active_tab', 0)
+
+
+@st.cache_resource
+def _start_logging():
+    """Start the background log listener once per process"""
+    return setup_logging(settings.LOG_LEVEL)
+
+
+@st.cache_resource
+def _validate_settings():
+    """Validate configuration once per process instead of on every rerun"""
+    return settings.validate()
 
 
 def render_header():
@@ -39,19 +56,21 @@ def render_header():
 
 
 def main():
+    _start_logging()
+    clear_request_cache()
     initialize_app()
     render_header()
     
+    # Check config silently
+    is_valid, _ = _validate_settings()
+    
     # Clean tabs
-    tab_names = ["Inbox", "Assistant", "Drafts", "Settings"]
-    tabs = st.tabs(tab_names)
+    tabs = st.tabs(_TAB_NAMES)
     
     with tabs[0]:
         render_email_list()
     
     with tabs[1]:
-        # Check config silently
-        is_valid, _ = settings.validate()
         if not is_valid:
             st.info("Please configure your API key in Settings to enable the Assistant.")
         else:
@@ -1,10 +1,45 @@
 import os
+import json
+import time
+import hashlib
+import functools
+from datetime import date
 import google.generativeai as genai
-from dotenv import load_dotenv
+from config.settings import settings
 
-load_dotenv()
+# Model listings are cached on disk for a day so repeat runs skip the API call
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "oceanai")
+CACHE_TTL_SECONDS = 24 * 60 * 60
 
-api_key = os.getenv("GOOGLE_API_KEY")
+
+def _cache_path(api_key: str) -> str:
+    """Cache file for this key and day (the key is hashed, never written out)"""
+    key_id = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"models_{key_id}_{date.today():%Y%m%d}.json")
+
+
+@functools.lru_cache(maxsize=None)
+def list_generate_models(api_key: str) -> tuple:
+    """Names of models supporting generateContent, from the disk cache when fresh"""
+    path = _cache_path(api_key)
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < CACHE_TTL_SECONDS:
+        with open(path, 'r') as f:
+            return tuple(json.load(f))
+
+    genai.configure(api_key=api_key)
+    names = tuple(
+        m.name for m in genai.list_models()
+        if 'generateContent' in m.supported_generation_methods
+    )
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(list(names), f)
+
+    return names
+
+
+api_key = settings.GOOGLE_API_KEY
 if not api_key:
     print("❌ No GOOGLE_API_KEY found in .env")
     exit(1)
@@ -12,11 +47,9 @@ if not api_key:
 print(f"🔑 Using API Key: {api_key[:5]}...{api_key[-5:]}")
 
 try:
-    genai.configure(api_key=api_key)
     print("\n📋 Listing available models...")
-    for m in genai.list_models():
-        if 'generateContent' in m.supported_generation_methods:
-            print(f"- {m.name}")
-            
+    for name in list_generate_models(api_key):
+        print(f"- {name}")
+
 except Exception as e:
     print(f"\n❌ Error listing models: {e}")
@@ -1,8 +1,16 @@
 import os
+import functools
 from dotenv import load_dotenv
 
+
+@functools.lru_cache(maxsize=None)
+def load_env() -> bool:
+    """Load environment variables from .env once per process"""
+    return load_dotenv()
+
+
 # Load environment variables
-load_dotenv()
+load_env()
 
 
 class Settings:
@@ -21,10 +29,44 @@ class Settings:
     MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash")
     TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
     MAX_TOKENS = int(os.getenv("MAX_TOKENS", "500"))
+    # Email prompts are cut to fit this many input tokens (long bodies are truncated)
+    MAX_INPUT_TOKENS = int(os.getenv("MAX_INPUT_TOKENS", "4000"))
+    
+    # Log level for the app's own loggers
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    
+    # Concurrent LLM requests when processing the inbox
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "20"))
+    # Chat replies generated at once across all sessions; more wait for a slot
+    CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "5"))
+    
+    # Provider rate limits for async LLM calls (0 tokens = untracked until the
+    # provider reports its limit in response headers)
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+    
+    # Process the inbox through the discounted Batch API by default (OpenAI/Anthropic only)
+    LLM_USE_BATCH_API = os.getenv("LLM_USE_BATCH_API", "false").lower() == "true"
+    
+    # Exact-match response cache for low-temperature LLM calls
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+    
+    # Reuse the category of a near-duplicate email (needs sentence-transformers and faiss)
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    SEMANTIC_CACHE_INDEX_PATH = os.getenv("SEMANTIC_CACHE_INDEX_PATH", "data/semantic_cache.faiss")
+    
+    # Sender domains categorized as Spam without asking the LLM (comma-separated)
+    SPAM_SENDER_DOMAINS = [d.strip() for d in os.getenv("SPAM_SENDER_DOMAINS", "").split(",") if d.strip()]
     
     # Database
     DATABASE_PATH = os.getenv("DATABASE_PATH", "data/email_agent.db")
     
+    # Rows per transaction when ingesting the mock inbox
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+    
     # Mock Data Paths
     MOCK_INBOX_PATH = "data/mock_inbox.json"
     DEFAULT_PROMPTS_PATH = "data/default_prompts.json"
@@ -32,28 +74,42 @@ class Settings:
     @classmethod
     def validate(cls):
         """Validate that required API key is present"""
-        if cls.LLM_PROVIDER == "openai" and not cls.OPENAI_API_KEY:
-            return False, "OpenAI API key is required. Please set OPENAI_API_KEY in .env file"
-        elif cls.LLM_PROVIDER == "anthropic" and not cls.ANTHROPIC_API_KEY:
-            return False, "Anthropic API key is required. Please set ANTHROPIC_API_KEY in .env file"
-        elif cls.LLM_PROVIDER == "gemini" and not cls.GOOGLE_API_KEY:
-            return False, "Google API key is required. Please set GOOGLE_API_KEY in .env file"
-        elif cls.LLM_PROVIDER == "grok" and not cls.GROK_API_KEY:
-            return False, "Grok API key is required. Please set GROK_API_KEY in .env file"
-        return True, "Configuration is valid"
+        return _validate_provider(cls.LLM_PROVIDER)
     
     @classmethod
     def get_api_key(cls):
         """Get the API key for the configured provider"""
-        if cls.LLM_PROVIDER == "openai":
-            return cls.OPENAI_API_KEY
-        elif cls.LLM_PROVIDER == "anthropic":
-            return cls.ANTHROPIC_API_KEY
-        elif cls.LLM_PROVIDER == "gemini":
-            return cls.GOOGLE_API_KEY
-        elif cls.LLM_PROVIDER == "grok":
-            return cls.GROK_API_KEY
-        return ""
+        return _api_key_for(cls.LLM_PROVIDER)
+
+
+# Settings are fixed once the module is imported, so lookups keyed on the
+# provider can be memoized for the lifetime of the process.
+@functools.lru_cache(maxsize=None)
+def _validate_provider(provider: str):
+    """Validate that the API key for a provider is present"""
+    if provider == "openai" and not Settings.OPENAI_API_KEY:
+        return False, "OpenAI API key is required. Please set OPENAI_API_KEY in .env file"
+    elif provider == "anthropic" and not Settings.ANTHROPIC_API_KEY:
+        return False, "Anthropic API key is required. Please set ANTHROPIC_API_KEY in .env file"
+    elif provider == "gemini" and not Settings.GOOGLE_API_KEY:
+        return False, "Google API key is required. Please set GOOGLE_API_KEY in .env file"
+    elif provider == "grok" and not Settings.GROK_API_KEY:
+        return False, "Grok API key is required. Please set GROK_API_KEY in .env file"
+    return True, "Configuration is valid"
+
+
+@functools.lru_cache(maxsize=None)
+def _api_key_for(provider: str) -> str:
+    """Get the API key for a provider"""
+    if provider == "openai":
+        return Settings.OPENAI_API_KEY
+    elif provider == "anthropic":
+        return Settings.ANTHROPIC_API_KEY
+    elif provider == "gemini":
+        return Settings.GOOGLE_API_KEY
+    elif provider == "grok":
+        return Settings.GROK_API_KEY
+    return ""
 
 
 settings = Settings()
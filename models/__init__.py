@@ -1,4 +1,4 @@
 """Models package"""
-from models.database import Database, EmailModel, ActionItemModel, PromptModel, DraftModel
+from models.database import Database, get_db, EmailModel, ActionItemModel, PromptModel, DraftModel, LLMCacheModel, SemanticCacheModel
 
-__all__ = ['Database', 'EmailModel', 'ActionItemModel', 'PromptModel', 'DraftModel']
+__all__ = ['Database', 'get_db', 'EmailModel', 'ActionItemModel', 'PromptModel', 'DraftModel', 'LLMCacheModel', 'SemanticCacheModel']
@@ -1,91 +1,288 @@
 import sqlite3
 import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Callable
 from config.settings import settings
+from utils.caching import cache_resource
+
+
+# Fields of an inbox record; these are stored as typed columns on emails
+_RAW_EMAIL_FIELDS = ('id', 'sender', 'subject', 'body', 'timestamp', 'category')
+
+# Hot read queries. Reusing the exact same SQL text lets each connection's
+# prepared-statement cache skip re-parsing them.
+_SQL_GET_ALL_EMAILS = 'SELECT * FROM emails ORDER BY timestamp DESC'
+_SQL_GET_EMAILS_BY_CATEGORY = 'SELECT * FROM emails WHERE category = ? ORDER BY timestamp DESC'
+_SQL_LIST_EMAIL_SUMMARIES = 'SELECT id, sender, subject, timestamp, category FROM emails ORDER BY timestamp DESC'
+_SQL_LIST_EMAIL_SUMMARIES_BY_CATEGORY = (
+    'SELECT id, sender, subject, timestamp, category FROM emails WHERE category = ? ORDER BY timestamp DESC'
+)
+_SQL_GET_EMAIL_BY_ID = 'SELECT * FROM emails WHERE id = ?'
+_SQL_GET_EMAILS_BY_IDS = 'SELECT * FROM emails WHERE id IN ({placeholders})'
+_SQL_COUNT_BY_CATEGORY = 'SELECT category, COUNT(*) AS count FROM emails GROUP BY category'
+_SQL_GET_ACTION_ITEMS_BY_EMAIL = 'SELECT * FROM action_items WHERE email_id = ? ORDER BY created_at DESC'
+_SQL_GET_ACTION_ITEMS_BY_STATUS = 'SELECT * FROM action_items WHERE status = ? ORDER BY created_at DESC'
+_SQL_GET_ALL_ACTION_ITEMS = 'SELECT * FROM action_items ORDER BY created_at DESC'
+_SQL_GET_PROMPT_BY_NAME = 'SELECT * FROM prompts WHERE name = ? AND is_active = 1'
+_SQL_GET_ALL_PROMPTS = 'SELECT * FROM prompts ORDER BY created_at DESC'
+_SQL_GET_ALL_DRAFTS = 'SELECT * FROM drafts ORDER BY created_at DESC'
+_SQL_GET_DRAFT_BY_ID = 'SELECT * FROM drafts WHERE id = ?'
+_SQL_GET_CACHED_RESPONSE = 'SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?'
+_SQL_GET_SEMANTIC_ENTRIES_AFTER = 'SELECT id, embedding, category FROM semantic_cache WHERE id > ? ORDER BY id'
+_SQL_GET_SEMANTIC_CATEGORIES = 'SELECT id, prompt_key, category FROM semantic_cache'
 
 
 class Database:
     """Database management class for the Email Productivity Agent"""
     
+    # Paths whose schema has already been created in this process
+    _initialized_paths = set()
+    
+    # Called after clear_all_data(), e.g. to drop cached reads of the cleared rows
+    _clear_listeners: List[Callable[[], None]] = []
+    
     def __init__(self, db_path: str = None):
         self.db_path = db_path or settings.DATABASE_PATH
-        self.init_database()
+        # One connection for the life of the app (Streamlit runs each rerun on a
+        # new thread), used by one thread at a time under the lock
+        self._conn = None
+        self._lock = threading.RLock()
+        self._search_enabled = None
+        
+        if self.db_path not in Database._initialized_paths:
+            self.init_database()
+            Database._initialized_paths.add(self.db_path)
     
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Get the shared database connection, opening it on first use; hold connection() while using it"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            return self._conn
+    
+    @contextmanager
+    def connection(self):
+        """Use the shared connection exclusively, so statements and transactions from other threads don't interleave"""
+        with self._lock:
+            conn = self.get_connection()
+            try:
+                yield conn
+            except BaseException:
+                # A failed write must not leave the shared connection inside a
+                # transaction that every later caller would join
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+    
+    def _connect(self):
+        """Open and tune a connection"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        
+        # Per-connection tuning; journal_mode is persistent and set in init_database
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-20000')
+        conn.execute('PRAGMA mmap_size=268435456')
+        conn.execute('PRAGMA foreign_keys=ON')
+        
+        return conn
+    
+    def close(self):
+        """Close the shared connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
     
     def init_database(self):
         """Initialize database schema"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Create emails table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS emails (
-                id TEXT PRIMARY KEY,
-                sender TEXT NOT NULL,
-                subject TEXT NOT NULL,
-                body TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                category TEXT DEFAULT 'Uncategorized',
-                raw_data TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            # WAL lets commits append to the log instead of rewriting the journal
+            cursor.execute('PRAGMA journal_mode=WAL')
+            
+            # Create emails table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS emails (
+                    id TEXT PRIMARY KEY,
+                    sender TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    category TEXT DEFAULT 'Uncategorized',
+                    raw_data TEXT,  -- legacy; no longer written, see EmailModel.get_raw
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Create action_items table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS action_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    email_id TEXT NOT NULL,
+                    task TEXT NOT NULL,
+                    deadline TEXT,
+                    status TEXT DEFAULT 'pending',
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (email_id) REFERENCES emails(id) ON DELETE CASCADE
+                )
+            ''')
+            
+            # Create prompts table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS prompts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE NOT NULL,
+                    content TEXT NOT NULL,
+                    is_active INTEGER DEFAULT 1,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Create drafts table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS drafts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    email_id TEXT,
+                    subject TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    metadata TEXT,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (email_id) REFERENCES emails(id) ON DELETE SET NULL
+                )
+            ''')
+            
+            # Create llm_cache table (responses keyed on a hash of the request)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            
+            # Create semantic_cache table (email embeddings and the category the
+            # categorization prompt identified by prompt_key gave them)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS semantic_cache (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    embedding BLOB NOT NULL,
+                    category TEXT NOT NULL,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    prompt_key TEXT NOT NULL DEFAULT ''
+                )
+            ''')
+            
+            # Databases created before entries were tied to a prompt; their
+            # entries get an empty key and never match again
+            cursor.execute('PRAGMA table_info(semantic_cache)')
+            if 'prompt_key' not in {row['name'] for row in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE semantic_cache ADD COLUMN prompt_key TEXT NOT NULL DEFAULT ''")
+            
+            # Indexes for the filter/sort columns used by the model queries
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_timestamp ON emails(timestamp DESC)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_category_ts ON emails(category, timestamp DESC)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_action_items_email ON action_items(email_id, created_at DESC)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_action_items_status ON action_items(status, created_at DESC)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_drafts_created ON drafts(created_at DESC)')
+            
+            self._init_search_index(cursor)
+            
+            conn.commit()
+    
+    def _init_search_index(self, cursor):
+        """Create the FTS5 index that mirrors emails, if this SQLite build supports it"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails_fts'")
+        if cursor.fetchone():
+            return
         
-        # Create action_items table
+        try:
+            # Trigram tokens give case-insensitive substring matching, like the old scan
+            cursor.execute('''
+                CREATE VIRTUAL TABLE emails_fts USING fts5(
+                    subject, body, sender,
+                    content='emails', content_rowid='rowid', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            # FTS5 or the trigram tokenizer is unavailable; search falls back to a scan
+            return
+        
+        # Keep the index in sync with the emails table
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS action_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email_id TEXT NOT NULL,
-                task TEXT NOT NULL,
-                deadline TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (email_id) REFERENCES emails(id) ON DELETE CASCADE
-            )
+            CREATE TRIGGER IF NOT EXISTS emails_fts_insert AFTER INSERT ON emails BEGIN
+                INSERT INTO emails_fts (rowid, subject, body, sender)
+                VALUES (new.rowid, new.subject, new.body, new.sender);
+            END
         ''')
-        
-        # Create prompts table
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS prompts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                content TEXT NOT NULL,
-                is_active INTEGER DEFAULT 1,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
+            CREATE TRIGGER IF NOT EXISTS emails_fts_delete AFTER DELETE ON emails BEGIN
+                INSERT INTO emails_fts (emails_fts, rowid, subject, body, sender)
+                VALUES ('delete', old.rowid, old.subject, old.body, old.sender);
+            END
         ''')
-        
-        # Create drafts table
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS drafts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email_id TEXT,
-                subject TEXT NOT NULL,
-                body TEXT NOT NULL,
-                metadata TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (email_id) REFERENCES emails(id) ON DELETE SET NULL
-            )
+            CREATE TRIGGER IF NOT EXISTS emails_fts_update AFTER UPDATE OF subject, body, sender ON emails BEGIN
+                INSERT INTO emails_fts (emails_fts, rowid, subject, body, sender)
+                VALUES ('delete', old.rowid, old.subject, old.body, old.sender);
+                INSERT INTO emails_fts (rowid, subject, body, sender)
+                VALUES (new.rowid, new.subject, new.body, new.sender);
+            END
         ''')
         
-        conn.commit()
-        conn.close()
+        # Index any emails stored before the index existed
+        cursor.execute("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')")
+    
+    @property
+    def search_enabled(self) -> bool:
+        """Whether the FTS5 search index is available"""
+        if self._search_enabled is None:
+            with self.connection() as conn:
+                cursor = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails_fts'"
+                )
+                self._search_enabled = cursor.fetchone() is not None
+        return self._search_enabled
+    
+    @classmethod
+    def on_clear(cls, callback: Callable[[], None]):
+        """Register a callback to run whenever clear_all_data() empties the tables"""
+        cls._clear_listeners.append(callback)
     
     def clear_all_data(self):
         """Clear all data from database (useful for reloading)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM action_items')
-        cursor.execute('DELETE FROM drafts')
-        cursor.execute('DELETE FROM emails')
-        
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                # One transaction with FK checks deferred to commit instead of per row
+                cursor.execute('BEGIN')
+                cursor.execute('PRAGMA defer_foreign_keys=ON')
+                
+                cursor.execute('DELETE FROM action_items')
+                cursor.execute('DELETE FROM drafts')
+                cursor.execute('DELETE FROM emails')
+                
+                # Restart AUTOINCREMENT ids as if the tables were freshly created
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('action_items', 'drafts')")
+                
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        
+        for callback in Database._clear_listeners:
+            callback()
+
+
+@cache_resource
+def get_db() -> Database:
+    """Get the shared Database instance used by all models (survives Streamlit reruns)"""
+    return Database()
 
 
 class EmailModel:
@@ -94,97 +291,188 @@ class EmailModel:
     @staticmethod
     def insert(email_data: Dict[str, Any]) -> bool:
         """Insert a new email"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        try:
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            # Existing emails are skipped rather than raising IntegrityError
             cursor.execute('''
-                INSERT INTO emails (id, sender, subject, body, timestamp, category, raw_data)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT OR IGNORE INTO emails (id, sender, subject, body, timestamp, category)
+                VALUES (?, ?, ?, ?, ?, ?)
             ''', (
                 email_data['id'],
                 email_data['sender'],
                 email_data['subject'],
                 email_data['body'],
                 email_data['timestamp'],
-                email_data.get('category', 'Uncategorized'),
-                json.dumps(email_data)
+                email_data.get('category', 'Uncategorized')
             ))
             conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            # Email already exists
-            return False
-        finally:
-            conn.close()
+            
+            return cursor.rowcount == 1
     
     @staticmethod
-    def get_all(category_filter: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Get all emails, optionally filtered by category"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        if category_filter and category_filter != "All":
-            cursor.execute(
-                'SELECT * FROM emails WHERE category = ? ORDER BY timestamp DESC',
-                (category_filter,)
+    def insert_many(emails: List[Dict[str, Any]]) -> int:
+        """Insert a batch of emails in a single transaction, skipping existing IDs"""
+        rows = [
+            (
+                email_data['id'],
+                email_data['sender'],
+                email_data['subject'],
+                email_data['body'],
+                email_data['timestamp'],
+                email_data.get('category', 'Uncategorized')
             )
-        else:
-            cursor.execute('SELECT * FROM emails ORDER BY timestamp DESC')
+            for email_data in emails
+        ]
         
-        columns = [desc[0] for desc in cursor.description]
-        emails = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
-        
-        return emails
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO emails (id, sender, subject, body, timestamp, category)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', rows)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            
+            # Ignored duplicates don't count towards rowcount
+            return cursor.rowcount
+    
+    @staticmethod
+    def get_all(category_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get all emails, optionally filtered by category"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            if category_filter and category_filter != "All":
+                cursor.execute(_SQL_GET_EMAILS_BY_CATEGORY, (category_filter,))
+            else:
+                cursor.execute(_SQL_GET_ALL_EMAILS)
+            
+            emails = [dict(row) for row in cursor.fetchall()]
+            
+            return emails
+    
+    @staticmethod
+    def list_summaries(category_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get the list-view columns of all emails, without bodies or raw data"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            if category_filter and category_filter != "All":
+                cursor.execute(_SQL_LIST_EMAIL_SUMMARIES_BY_CATEGORY, (category_filter,))
+            else:
+                cursor.execute(_SQL_LIST_EMAIL_SUMMARIES)
+            
+            emails = [dict(row) for row in cursor.fetchall()]
+            
+            return emails
     
     @staticmethod
     def get_by_id(email_id: str) -> Optional[Dict[str, Any]]:
         """Get email by ID"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM emails WHERE id = ?', (email_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            columns = ['id', 'sender', 'subject', 'body', 'timestamp', 'category', 'raw_data', 'created_at']
-            return dict(zip(columns, row))
-        return None
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_GET_EMAIL_BY_ID, (email_id,))
+            row = cursor.fetchone()
+            
+            if row:
+                return dict(row)
+            return None
+    
+    @staticmethod
+    def get_by_ids(email_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get several emails in as few queries as possible, keyed by ID; unknown IDs are left out"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            # Stay well under SQLite's bound-parameter limit
+            ids = list(dict.fromkeys(email_ids))
+            emails = {}
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                cursor.execute(_SQL_GET_EMAILS_BY_IDS.format(placeholders=", ".join("?" * len(chunk))), chunk)
+                emails.update((row['id'], dict(row)) for row in cursor.fetchall())
+            
+            return emails
+    
+    @staticmethod
+    def get_raw(email_id: str) -> Optional[Dict[str, Any]]:
+        """Get the original email record, rebuilt from the typed columns"""
+        email = EmailModel.get_by_id(email_id)
+        if not email:
+            return None
+        return {field: email[field] for field in _RAW_EMAIL_FIELDS}
+    
+    @staticmethod
+    def search(query: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Full-text search emails, optionally restricted to some of subject/body/sender"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            # Quote the query as a phrase so user input is never parsed as FTS syntax
+            match = '"' + query.replace('"', '""') + '"'
+            if fields:
+                match = '{' + ' '.join(fields) + '}: ' + match
+            
+            cursor.execute('''
+                SELECT emails.* FROM emails
+                JOIN emails_fts ON emails_fts.rowid = emails.rowid
+                WHERE emails_fts MATCH ?
+                ORDER BY emails.timestamp DESC
+            ''', (match,))
+            
+            emails = [dict(row) for row in cursor.fetchall()]
+            
+            return emails
     
     @staticmethod
     def update_category(email_id: str, category: str) -> bool:
         """Update email category"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'UPDATE emails SET category = ? WHERE id = ?',
-            (category, email_id)
-        )
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        
-        return success
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'UPDATE emails SET category = ? WHERE id = ?',
+                (category, email_id)
+            )
+            conn.commit()
+            success = cursor.rowcount > 0
+            
+            return success
+    
+    @staticmethod
+    def update_categories(pairs: List[Tuple[str, str]]) -> int:
+        """Apply (email_id, category) updates in a single transaction"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.executemany(
+                    'UPDATE emails SET category = ? WHERE id = ?',
+                    [(category, email_id) for email_id, category in pairs]
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            
+            return cursor.rowcount
     
     @staticmethod
     def get_count_by_category() -> Dict[str, int]:
         """Get count of emails per category"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT category, COUNT(*) FROM emails GROUP BY category')
-        counts = dict(cursor.fetchall())
-        conn.close()
-        
-        return counts
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_COUNT_BY_CATEGORY)
+            counts = {row['category']: row['count'] for row in cursor.fetchall()}
+            
+            return counts
 
 
 class ActionItemModel:
@@ -193,76 +481,82 @@ class ActionItemModel:
     @staticmethod
     def insert(email_id: str, task: str, deadline: str = "Not specified") -> int:
         """Insert a new action item"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO action_items (email_id, task, deadline)
-            VALUES (?, ?, ?)
-        ''', (email_id, task, deadline))
-        
-        conn.commit()
-        item_id = cursor.lastrowid
-        conn.close()
-        
-        return item_id
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO action_items (email_id, task, deadline)
+                VALUES (?, ?, ?)
+            ''', (email_id, task, deadline))
+            
+            conn.commit()
+            item_id = cursor.lastrowid
+            
+            return item_id
+    
+    @staticmethod
+    def insert_many(items: List[Tuple[str, str, str]]) -> List[int]:
+        """Insert (email_id, task, deadline) action items in a single transaction"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            # executemany() doesn't report row IDs, so execute per row but commit once
+            item_ids = []
+            try:
+                for item in items:
+                    cursor.execute('''
+                        INSERT INTO action_items (email_id, task, deadline)
+                        VALUES (?, ?, ?)
+                    ''', item)
+                    item_ids.append(cursor.lastrowid)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            
+            return item_ids
     
     @staticmethod
     def get_by_email(email_id: str) -> List[Dict[str, Any]]:
         """Get all action items for an email"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT * FROM action_items WHERE email_id = ? ORDER BY created_at DESC',
-            (email_id,)
-        )
-        
-        columns = [desc[0] for desc in cursor.description]
-        items = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
-        
-        return items
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_GET_ACTION_ITEMS_BY_EMAIL, (email_id,))
+            
+            items = [dict(row) for row in cursor.fetchall()]
+            
+            return items
     
     @staticmethod
     def get_all(status: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get all action items, optionally filtered by status"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        if status:
-            cursor.execute(
-                'SELECT * FROM action_items WHERE status = ? ORDER BY created_at DESC',
-                (status,)
-            )
-        else:
-            cursor.execute('SELECT * FROM action_items ORDER BY created_at DESC')
-        
-        columns = [desc[0] for desc in cursor.description]
-        items = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
-        
-        return items
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            if status:
+                cursor.execute(_SQL_GET_ACTION_ITEMS_BY_STATUS, (status,))
+            else:
+                cursor.execute(_SQL_GET_ALL_ACTION_ITEMS)
+            
+            items = [dict(row) for row in cursor.fetchall()]
+            
+            return items
     
     @staticmethod
     def update_status(item_id: int, status: str) -> bool:
         """Update action item status"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'UPDATE action_items SET status = ? WHERE id = ?',
-            (status, item_id)
-        )
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        
-        return success
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'UPDATE action_items SET status = ? WHERE id = ?',
+                (status, item_id)
+            )
+            conn.commit()
+            success = cursor.rowcount > 0
+            
+            return success
 
 
 class PromptModel:
@@ -271,77 +565,61 @@ class PromptModel:
     @staticmethod
     def insert(name: str, content: str, is_active: bool = True) -> int:
         """Insert a new prompt"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        try:
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            # Upsert: an existing prompt with this name is updated in place
             cursor.execute('''
                 INSERT INTO prompts (name, content, is_active)
                 VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET content = excluded.content, is_active = excluded.is_active
+                RETURNING id
             ''', (name, content, 1 if is_active else 0))
             
+            # RETURNING rows must be fetched before the commit
+            prompt_id = cursor.fetchone()[0]
             conn.commit()
-            prompt_id = cursor.lastrowid
+            
             return prompt_id
-        except sqlite3.IntegrityError:
-            # Prompt with this name already exists, update it
-            cursor.execute('''
-                UPDATE prompts SET content = ?, is_active = ?
-                WHERE name = ?
-            ''', (content, 1 if is_active else 0, name))
-            conn.commit()
-            cursor.execute('SELECT id FROM prompts WHERE name = ?', (name,))
-            return cursor.fetchone()[0]
-        finally:
-            conn.close()
     
     @staticmethod
     def get_by_name(name: str) -> Optional[Dict[str, Any]]:
         """Get prompt by name"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM prompts WHERE name = ? AND is_active = 1', (name,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            columns = ['id', 'name', 'content', 'is_active', 'created_at']
-            return dict(zip(columns, row))
-        return None
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_GET_PROMPT_BY_NAME, (name,))
+            row = cursor.fetchone()
+            
+            if row:
+                return dict(row)
+            return None
     
     @staticmethod
     def get_all() -> List[Dict[str, Any]]:
         """Get all prompts"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM prompts ORDER BY created_at DESC')
-        columns = [desc[0] for desc in cursor.description]
-        prompts = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
-        
-        return prompts
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_GET_ALL_PROMPTS)
+            prompts = [dict(row) for row in cursor.fetchall()]
+            
+            return prompts
     
     @staticmethod
     def update(name: str, content: str) -> bool:
         """Update prompt content"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'UPDATE prompts SET content = ? WHERE name = ?',
-            (content, name)
-        )
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        
-        return success
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'UPDATE prompts SET content = ? WHERE name = ?',
+                (content, name)
+            )
+            conn.commit()
+            success = cursor.rowcount > 0
+            
+            return success
 
 
 class DraftModel:
@@ -350,81 +628,163 @@ class DraftModel:
     @staticmethod
     def insert(subject: str, body: str, email_id: Optional[str] = None, metadata: Optional[Dict] = None) -> int:
         """Insert a new draft"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO drafts (email_id, subject, body, metadata)
-            VALUES (?, ?, ?, ?)
-        ''', (email_id, subject, body, json.dumps(metadata) if metadata else None))
-        
-        conn.commit()
-        draft_id = cursor.lastrowid
-        conn.close()
-        
-        return draft_id
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO drafts (email_id, subject, body, metadata)
+                VALUES (?, ?, ?, ?)
+            ''', (email_id, subject, body, json.dumps(metadata) if metadata else None))
+            
+            conn.commit()
+            draft_id = cursor.lastrowid
+            
+            return draft_id
     
     @staticmethod
     def get_all() -> List[Dict[str, Any]]:
         """Get all drafts"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM drafts ORDER BY created_at DESC')
-        columns = [desc[0] for desc in cursor.description]
-        drafts = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
-        
-        return drafts
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_GET_ALL_DRAFTS)
+            drafts = [dict(row) for row in cursor.fetchall()]
+            
+            return drafts
     
     @staticmethod
     def get_by_id(draft_id: int) -> Optional[Dict[str, Any]]:
         """Get draft by ID"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM drafts WHERE id = ?', (draft_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            columns = ['id', 'email_id', 'subject', 'body', 'metadata', 'created_at']
-            return dict(zip(columns, row))
-        return None
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_GET_DRAFT_BY_ID, (draft_id,))
+            row = cursor.fetchone()
+            
+            if row:
+                return dict(row)
+            return None
     
     @staticmethod
     def update(draft_id: int, subject: str, body: str) -> bool:
         """Update draft content"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'UPDATE drafts SET subject = ?, body = ? WHERE id = ?',
-            (subject, body, draft_id)
-        )
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        
-        return success
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'UPDATE drafts SET subject = ?, body = ? WHERE id = ?',
+                (subject, body, draft_id)
+            )
+            conn.commit()
+            success = cursor.rowcount > 0
+            
+            return success
     
     @staticmethod
     def delete(draft_id: int) -> bool:
         """Delete a draft"""
-        db = Database()
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM drafts WHERE id = ?', (draft_id,))
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        
-        return success
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM drafts WHERE id = ?', (draft_id,))
+            conn.commit()
+            success = cursor.rowcount > 0
+            
+            return success
+
+
+class LLMCacheModel:
+    """Cached LLM response data model"""
+    
+    @staticmethod
+    def get(key: str, min_created_at: float = 0) -> Optional[str]:
+        """Get a cached response stored at or after min_created_at (unix time)"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_GET_CACHED_RESPONSE, (key, min_created_at))
+            row = cursor.fetchone()
+            
+            if row:
+                return row['response']
+            return None
+    
+    @staticmethod
+    def set(key: str, response: str, created_at: float):
+        """Insert or refresh a cached response"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO llm_cache (key, response, created_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    response = excluded.response,
+                    created_at = excluded.created_at
+            ''', (key, response, created_at))
+            conn.commit()
+
+
+class SemanticCacheModel:
+    """Cached email embedding data model"""
+    
+    @staticmethod
+    def insert(embedding: bytes, category: str, prompt_key: str = "") -> int:
+        """Insert an embedding with the category the prompt identified by prompt_key gave it"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'INSERT INTO semantic_cache (embedding, category, prompt_key) VALUES (?, ?, ?)',
+                (embedding, category, prompt_key)
+            )
+            conn.commit()
+            entry_id = cursor.lastrowid
+            
+            return entry_id
+    
+    @staticmethod
+    def insert_many(entries: List[Tuple[bytes, str, str]]) -> List[int]:
+        """Insert (embedding, category, prompt_key) entries in a single transaction"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            # executemany() doesn't report row IDs, so execute per row but commit once
+            entry_ids = []
+            try:
+                for entry in entries:
+                    cursor.execute(
+                        'INSERT INTO semantic_cache (embedding, category, prompt_key) VALUES (?, ?, ?)', entry
+                    )
+                    entry_ids.append(cursor.lastrowid)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            
+            return entry_ids
+    
+    @staticmethod
+    def get_all(after_id: int = 0) -> List[Dict[str, Any]]:
+        """Get cached embeddings, optionally only those with an ID above after_id"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_GET_SEMANTIC_ENTRIES_AFTER, (after_id,))
+            entries = [dict(row) for row in cursor.fetchall()]
+            
+            return entries
+    
+    @staticmethod
+    def get_categories() -> Dict[int, Tuple[str, str]]:
+        """Get the (prompt_key, category) of every cached embedding, by entry ID"""
+        with get_db().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_SQL_GET_SEMANTIC_CATEGORIES)
+            categories = {row['id']: (row['prompt_key'], row['category']) for row in cursor.fetchall()}
+            
+            return categories
 
 
 # Initialize database when module is imported
@@ -1,8 +1,72 @@
 """Email Service - Manages email operations"""
 import json
-from typing import List, Dict, Optional, Any
-from models.database import EmailModel, ActionItemModel
+import re
+from collections import Counter
+from itertools import islice
+from typing import List, Dict, Optional, Any, Tuple
+from models.database import Database, EmailModel, ActionItemModel, get_db
 from config.settings import settings
+from utils.caching import cache_data
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+# Bumped on every write; cached reads are keyed on it so they are only
+# recomputed after the data actually changes.
+_data_version = 0
+
+
+def _invalidate_cache():
+    """Invalidate cached email reads after a write"""
+    global _data_version
+    _data_version += 1
+
+
+# Clearing the database bypasses this service, so it bumps the version too
+Database.on_clear(_invalidate_cache)
+
+
+@cache_data
+def _cached_emails(version: int, category_filter: Optional[str]) -> List[Dict[str, Any]]:
+    return EmailModel.get_all(category_filter)
+
+
+@cache_data
+def _cached_email_summaries(version: int, category_filter: Optional[str]) -> List[Dict[str, Any]]:
+    return EmailModel.list_summaries(category_filter)
+
+
+@cache_data(max_entries=256)
+def _cached_email(version: int, email_id: str) -> Optional[Dict[str, Any]]:
+    return EmailModel.get_by_id(email_id)
+
+
+@cache_data
+def _cached_category_stats(version: int) -> Dict[str, int]:
+    return EmailModel.get_count_by_category()
+
+
+@cache_data
+def _cached_inbox_digest(version: int) -> str:
+    emails = EmailModel.list_summaries()
+    stats = dict(Counter(email['category'] for email in emails))
+    
+    parts = [
+        "Inbox summary:\n",
+        f"Total emails: {len(emails)}\n",
+        f"Categories: {stats}\n\n",
+        "Recent emails:\n"
+    ]
+    parts.extend(f"- {email['subject']} from {email['sender']}\n" for email in emails[:5])
+    return "".join(parts)
+
+
+@cache_data
+def _cached_action_items(version: int, status: Optional[str]) -> List[Dict[str, Any]]:
+    return ActionItemModel.get_all(status)
 
 
 class EmailService:
@@ -16,21 +80,27 @@ class EmailService:
         Returns:
             Tuple of (success, message, count)
         """
+        loaded_count = 0
         try:
-            with open(settings.MOCK_INBOX_PATH, 'r') as f:
-                emails = json.load(f)
-            
-            loaded_count = 0
-            for email_data in emails:
-                success = EmailModel.insert(email_data)
-                if success:
-                    loaded_count += 1
+            with open(settings.MOCK_INBOX_PATH, 'rb') as f:
+                # Stream array items when ijson is installed instead of loading the whole file
+                emails = iter(ijson.items(f, 'item') if ijson else json.load(f))
+                
+                # One transaction per batch instead of a commit per email
+                while True:
+                    batch = list(islice(emails, settings.INGEST_BATCH_SIZE))
+                    if not batch:
+                        break
+                    loaded_count += EmailModel.insert_many(batch)
             
             return True, f"Successfully loaded {loaded_count} emails", loaded_count
         except FileNotFoundError:
             return False, f"Mock inbox file not found: {settings.MOCK_INBOX_PATH}", 0
         except Exception as e:
-            return False, f"Error loading mock inbox: {str(e)}", 0
+            # Batches committed before the failure stay in the inbox
+            return False, f"Error loading mock inbox after {loaded_count} emails: {str(e)}", loaded_count
+        finally:
+            _invalidate_cache()
     
     @staticmethod
     def get_all_emails(category_filter: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -43,7 +113,20 @@ class EmailService:
         Returns:
             List of email dictionaries
         """
-        return EmailModel.get_all(category_filter)
+        return _cached_emails(_data_version, category_filter)
+    
+    @staticmethod
+    def get_all_emails_summary(category_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get the inbox list view: id, sender, subject, timestamp and category only
+        
+        Args:
+            category_filter: Filter by this category (or None for all)
+            
+        Returns:
+            List of email summary dictionaries
+        """
+        return _cached_email_summaries(_data_version, category_filter)
     
     @staticmethod
     def get_email_by_id(email_id: str) -> Optional[Dict[str, Any]]:
@@ -56,7 +139,22 @@ class EmailService:
         Returns:
             Email dictionary or None
         """
-        return EmailModel.get_by_id(email_id)
+        return _cached_email(_data_version, email_id)
+    
+    @staticmethod
+    def get_emails_by_ids(email_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get several emails at once
+        
+        Args:
+            email_ids: Email IDs
+            
+        Returns:
+            Dictionary mapping each found ID to its email
+        """
+        if not email_ids:
+            return {}
+        return EmailModel.get_by_ids(email_ids)
     
     @staticmethod
     def update_category(email_id: str, new_category: str) -> bool:
@@ -70,7 +168,27 @@ class EmailService:
         Returns:
             True if successful
         """
-        return EmailModel.update_category(email_id, new_category)
+        success = EmailModel.update_category(email_id, new_category)
+        _invalidate_cache()
+        return success
+    
+    @staticmethod
+    def bulk_update_categories(pairs: List[Tuple[str, str]]) -> int:
+        """
+        Update the category of several emails in one transaction
+        
+        Args:
+            pairs: (email_id, category) tuples
+            
+        Returns:
+            Number of emails updated
+        """
+        if not pairs:
+            return 0
+        
+        updated = EmailModel.update_categories(pairs)
+        _invalidate_cache()
+        return updated
     
     @staticmethod
     def get_category_stats() -> Dict[str, int]:
@@ -80,7 +198,19 @@ class EmailService:
         Returns:
             Dictionary mapping categories to counts
         """
-        return EmailModel.get_count_by_category()
+        return _cached_category_stats(_data_version)
+    
+    @staticmethod
+    def get_inbox_digest() -> str:
+        """
+        Get a short text summary of the inbox (counts and most recent emails)
+        
+        Built from the list-view columns only, and rebuilt only after the inbox changes.
+        
+        Returns:
+            Digest text for use as LLM context
+        """
+        return _cached_inbox_digest(_data_version)
     
     @staticmethod
     def add_action_item(email_id: str, task: str, deadline: str = "Not specified") -> int:
@@ -95,7 +225,52 @@ class EmailService:
         Returns:
             ID of created action item
         """
-        return ActionItemModel.insert(email_id, task, deadline)
+        item_id = ActionItemModel.insert(email_id, task, deadline)
+        _invalidate_cache()
+        return item_id
+    
+    @staticmethod
+    def add_action_items_bulk(email_id: str, tasks: List[Dict[str, Any]]) -> List[int]:
+        """
+        Add several action items for an email in one transaction
+        
+        Args:
+            email_id: Email ID
+            tasks: Action items, each with 'task' and optional 'deadline'
+            
+        Returns:
+            IDs of created action items
+        """
+        if not tasks:
+            return []
+        
+        item_ids = ActionItemModel.insert_many([
+            (email_id, task.get('task', ''), task.get('deadline', 'Not specified'))
+            for task in tasks
+        ])
+        _invalidate_cache()
+        return item_ids
+    
+    @staticmethod
+    def bulk_add_action_items(items: List[Dict[str, Any]]) -> List[int]:
+        """
+        Add action items for any number of emails in one transaction
+        
+        Args:
+            items: Action items, each with 'email_id', 'task' and optional 'deadline'
+            
+        Returns:
+            IDs of created action items
+        """
+        if not items:
+            return []
+        
+        item_ids = ActionItemModel.insert_many([
+            (item['email_id'], item.get('task', ''), item.get('deadline', 'Not specified'))
+            for item in items
+        ])
+        _invalidate_cache()
+        return item_ids
     
     @staticmethod
     def get_action_items(email_id: str) -> List[Dict[str, Any]]:
@@ -121,7 +296,7 @@ class EmailService:
         Returns:
             List of action item dictionaries
         """
-        return ActionItemModel.get_all(status)
+        return _cached_action_items(_data_version, status)
     
     @staticmethod
     def update_action_item_status(item_id: int, status: str) -> bool:
@@ -135,7 +310,9 @@ class EmailService:
         Returns:
             True if successful
         """
-        return ActionItemModel.update_status(item_id, status)
+        success = ActionItemModel.update_status(item_id, status)
+        _invalidate_cache()
+        return success
     
     @staticmethod
     def search_emails(query: str, in_field: str = "all") -> List[Dict[str, Any]]:
@@ -149,20 +326,22 @@ class EmailService:
         Returns:
             List of matching emails
         """
-        all_emails = EmailModel.get_all()
-        query_lower = query.lower()
+        # The trigram index needs at least three characters to match anything
+        searchable_fields = ("subject", "body", "sender")
+        if (get_db().search_enabled and len(query) >= 3
+                and (in_field == "all" or in_field in searchable_fields)):
+            fields = None if in_field == "all" else [in_field]
+            return EmailModel.search(query, fields)
         
-        results = []
-        for email in all_emails:
-            if in_field == "all":
-                searchable_text = f"{email['subject']} {email['body']} {email['sender']}".lower()
-            else:
-                searchable_text = email.get(in_field, "").lower()
-            
-            if query_lower in searchable_text:
-                results.append(email)
+        # Fallback scan: one compiled case-insensitive pattern, checked field by
+        # field so a match short-circuits without lowercasing or concatenating
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        fields = searchable_fields if in_field == "all" else (in_field,)
         
-        return results
+        return [
+            email for email in EmailModel.get_all()
+            if any(pattern.search(email.get(field) or "") for field in fields)
+        ]
 
 
 # Create singleton instance
@@ -0,0 +1,95 @@
+"""LLM Cache - Exact-match cache for LLM responses"""
+import json
+import time
+import logging
+import hashlib
+from typing import Optional
+from models.database import LLMCacheModel
+from config.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCache:
+    """Cache of LLM responses keyed on the full request, persisted in SQLite"""
+    
+    def __init__(self, enabled: bool = True, ttl_seconds: int = 7 * 24 * 60 * 60,
+                 max_temperature: float = 0.5):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        # Above this temperature responses are meant to vary, so never cache them
+        self.max_temperature = max_temperature
+    
+    def cache_key(self, provider: str, model: str, prompt: str, temperature: float, max_tokens: int,
+                  system: str = "") -> Optional[str]:
+        """
+        Build the cache key for a request
+        
+        Args:
+            provider: LLM provider name
+            model: Model name
+            prompt: Full prompt sent to the model
+            temperature: Sampling temperature
+            max_tokens: Response token limit
+            system: Static instructions sent with the prompt
+        
+        Returns:
+            Hex digest key, or None if this request should not be cached
+        """
+        if not self.enabled or temperature > self.max_temperature:
+            return None
+        
+        payload = json.dumps({
+            "provider": provider,
+            "model": model,
+            "system": system,
+            "prompt": prompt,
+            "temp": temperature,
+            "max_tokens": max_tokens
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def chat_key(self, provider: str, model: str, query: str, context: str = "") -> Optional[str]:
+        """
+        Build the cache key for a chat query
+        
+        Chat runs at a high temperature, but asking the same question about the
+        same context again gets the earlier answer. Case and spacing in the
+        question are ignored.
+        
+        Returns:
+            Hex digest key, or None if caching is disabled
+        """
+        if not self.enabled:
+            return None
+        
+        payload = json.dumps({
+            "provider": provider,
+            "model": model,
+            "chat": " ".join(query.lower().split()),
+            "context": context
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response that is still within the TTL"""
+        try:
+            return LLMCacheModel.get(key, time.time() - self.ttl_seconds)
+        except Exception:
+            logger.exception("Error reading LLM cache")
+            return None
+    
+    def set(self, key: str, response: str):
+        """Store a response"""
+        try:
+            LLMCacheModel.set(key, response, time.time())
+        except Exception:
+            logger.exception("Error writing LLM cache")
+
+
+# Create singleton instance
+llm_cache = LLMCache(
+    enabled=settings.LLM_CACHE_ENABLED,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS
+)
@@ -1,7 +1,131 @@
 """LLM Service - Handles all LLM API interactions"""
+import re
 import json
-from typing import Dict, Any, Optional
+import time
+import logging
+import hashlib
+import functools
+import asyncio
+import weakref
+import threading
+from typing import Dict, Any, Optional, Tuple, List, Callable, Iterator
+import httpx
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 from config.settings import settings
+from services.llm_cache import llm_cache
+from services.semantic_cache import semantic_cache
+from services.prompt_service import prompt_service
+from services.rate_limiter import get_rate_limiter, retry_after_seconds
+from utils.token_utils import count_tokens, truncate_to_tokens
+
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You are a helpful email assistant."
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+
+# Senders that only ever send bulk mail
+_BULK_SENDER_RE = re.compile(r"(noreply|no-reply|newsletter|mailer)@", re.IGNORECASE)
+
+# First category name mentioned in a categorization response
+_CATEGORY_RE = re.compile(r"\b(Important|Newsletter|Spam|To-Do)\b", re.IGNORECASE)
+
+# Outermost JSON array in a free-text response
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+# Structured output schema for action item extraction; providers require an
+# object at the top level, so the list is wrapped in one
+ACTION_ITEMS_SCHEMA = {
+    "name": "action_items",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "action_items": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "task": {"type": "string"},
+                        "deadline": {"type": "string"}
+                    },
+                    "required": ["task", "deadline"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["action_items"],
+        "additionalProperties": False
+    }
+}
+
+
+def _domain_pattern(domains: List[str]) -> Optional[re.Pattern]:
+    """Compile a pattern matching sender addresses at any of the domains (or their subdomains)"""
+    if not domains:
+        return None
+    alternatives = "|".join(re.escape(domain) for domain in domains)
+    return re.compile(rf"@(?:[\w-]+\.)*(?:{alternatives})\b", re.IGNORECASE)
+
+
+_SPAM_SENDER_RE = _domain_pattern(settings.SPAM_SENDER_DOMAINS)
+
+
+def _http_client_options() -> Dict[str, Any]:
+    """Keep-alive pool settings shared by the sync and async HTTP clients"""
+    return {
+        'http2': _HTTP2,
+        'limits': httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        'timeout': httpx.Timeout(60.0, connect=10.0),
+    }
+
+
+@functools.lru_cache(maxsize=64)
+def _template_tokens(template: str, model_name: Optional[str]) -> int:
+    """Tokens in a prompt template, counted once per template"""
+    return count_tokens(f"{SYSTEM_PROMPT}\n\n{template}", model_name)
+
+
+@functools.lru_cache(maxsize=32)
+def _prompt_key(template: str) -> str:
+    """Short digest identifying a prompt template (instructions included)"""
+    return hashlib.sha256(template.encode('utf-8')).hexdigest()[:16]
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    """True for provider rate-limit errors (HTTP 429 / quota exhausted)"""
+    if getattr(error, 'status_code', None) == 429:
+        return True
+    return type(error).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests")
+
+
+_backoff = wait_random_exponential(multiplier=1, max=30)
+
+
+def _wait_for_rate_limit(retry_state) -> float:
+    """Wait as long as the provider's Retry-After asks, else back off exponentially"""
+    response = getattr(retry_state.outcome.exception(), 'response', None)
+    delay = retry_after_seconds(response.headers) if response is not None else None
+    if delay is None:
+        return _backoff(retry_state)
+    
+    # Hold back the other in-flight requests to this provider too
+    get_rate_limiter(retry_state.args[0].provider).pause(delay)
+    return delay
+
+
+# Retry rate-limited async calls, honoring Retry-After
+_retry_on_rate_limit = retry(
+    retry=retry_if_exception(_is_rate_limited),
+    wait=_wait_for_rate_limit,
+    stop=stop_after_attempt(5),
+    reraise=True
+)
 
 
 class LLMService:
@@ -16,40 +140,163 @@ class LLMService:
         
         # Initialize the appropriate client
         self._init_client()
+        # Async clients are bound to the event loop they were first used on, and
+        # each session's process_inbox runs its own loop
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        # Every session's chat runs on its own script thread; this bounds how
+        # many replies are generated at once so chat can't starve inbox processing
+        self._chat_slots = threading.BoundedSemaphore(settings.CHAT_MAX_CONCURRENCY)
     
     def _init_client(self):
         """Initialize the LLM client based on provider"""
         try:
             if self.provider == "openai":
                 import openai
-                self.client = openai.OpenAI(api_key=self.api_key)
+                self.client = openai.OpenAI(
+                    api_key=self.api_key,
+                    http_client=httpx.Client(**_http_client_options())
+                )
             elif self.provider == "anthropic":
                 import anthropic
-                self.client = anthropic.Anthropic(api_key=self.api_key)
+                self.client = anthropic.Anthropic(
+                    api_key=self.api_key,
+                    http_client=httpx.Client(**_http_client_options())
+                )
             elif self.provider == "gemini":
                 import google.generativeai as genai
+                # Gemini talks gRPC, which already multiplexes calls over one channel
                 genai.configure(api_key=self.api_key)
-                
-                # Handle deprecated model name
-                model = self.model_name
-                if model in ['gemini-pro', 'gemini-1.5-flash']:
-                    model = 'gemini-2.0-flash'
-                    
-                self.client = genai.GenerativeModel(model or 'gemini-2.0-flash')
+                self.client = genai.GenerativeModel(self._gemini_model_name())
             elif self.provider == "grok":
                 import openai
                 # Grok uses OpenAI-compatible API
                 self.client = openai.OpenAI(
                     api_key=self.api_key,
-                    base_url="https://api.x.ai/v1"
+                    base_url="https://api.x.ai/v1",
+                    http_client=httpx.Client(**_http_client_options())
                 )
             else:
                 raise ValueError(f"Unsupported LLM provider: {self.provider}")
-        except Exception as e:
-            print(f"Error initializing LLM client: {e}")
+        except Exception:
+            logger.exception("Error initializing LLM client")
             self.client = None
     
-    def query_llm(self, prompt: str, context: str = "", temperature: Optional[float] = None) -> str:
+    def _gemini_model_name(self) -> str:
+        """Gemini model to use, mapping deprecated names to their replacement"""
+        model = self.model_name
+        if model in ['gemini-pro', 'gemini-1.5-flash']:
+            model = 'gemini-2.0-flash'
+        return model or 'gemini-2.0-flash'
+    
+    def _get_async_client(self):
+        """The running event loop's async client, created on first use there"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._new_async_client()
+            self._async_clients[loop] = client
+        return client
+    
+    def _new_async_client(self):
+        """Create an async client; it must only be used on the loop it was created for"""
+        if self.provider == "openai":
+            import openai
+            return openai.AsyncOpenAI(
+                api_key=self.api_key,
+                http_client=httpx.AsyncClient(**_http_client_options())
+            )
+        elif self.provider == "anthropic":
+            import anthropic
+            return anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                http_client=httpx.AsyncClient(**_http_client_options())
+            )
+        elif self.provider == "grok":
+            import openai
+            return openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url="https://api.x.ai/v1",
+                http_client=httpx.AsyncClient(**_http_client_options())
+            )
+        elif self.provider == "gemini":
+            import google.generativeai as genai
+            # GenerativeModel binds its gRPC aio client to the first loop that
+            # calls generate_content_async, so each loop gets its own model
+            return genai.GenerativeModel(self._gemini_model_name())
+        return None
+    
+    async def aclose(self):
+        """Close the running event loop's async client and its connection pool; other loops' clients are untouched"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None and hasattr(client, 'close'):
+            await client.close()
+    
+    def _chat_request(self, full_prompt: str, temp: float, system: str = "",
+                      json_schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Request arguments for the OpenAI-compatible chat API (OpenAI, Grok)"""
+        request = {
+            'model': (self.model_name or "grok-beta") if self.provider == "grok" else self.model_name,
+            'messages': [
+                {"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{system}" if system else SYSTEM_PROMPT},
+                {"role": "user", "content": full_prompt}
+            ],
+            'temperature': temp,
+            'max_tokens': self.max_tokens
+        }
+        if system and self.provider == "openai":
+            # Route requests sharing these instructions to the same prompt cache
+            request['prompt_cache_key'] = hashlib.sha256(system.encode('utf-8')).hexdigest()[:32]
+        if json_schema:
+            request['response_format'] = {"type": "json_schema", "json_schema": {**json_schema, "strict": True}}
+        return request
+    
+    def _messages_request(self, full_prompt: str, temp: float, system: str = "",
+                          json_schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Request arguments for the Anthropic messages API"""
+        request = {
+            'model': self.model_name or "claude-3-sonnet-20240229",
+            'max_tokens': self.max_tokens,
+            'temperature': temp,
+            'messages': [
+                {"role": "user", "content": full_prompt}
+            ]
+        }
+        if system:
+            # Mark the static instructions as a cacheable prefix
+            request['system'] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        if json_schema:
+            # Anthropic has no JSON mode; forcing a tool call gets input matching the schema
+            request['tools'] = [{"name": json_schema['name'], "input_schema": json_schema['schema']}]
+            request['tool_choice'] = {"type": "tool", "name": json_schema['name']}
+        return request
+    
+    @staticmethod
+    def _message_text(message) -> str:
+        """Text of an Anthropic message; a forced tool call's input is returned as JSON"""
+        block = message.content[0]
+        if block.type == "tool_use":
+            return json.dumps(block.input)
+        return block.text.strip()
+    
+    @staticmethod
+    def _gemini_contents(full_prompt: str, system: str = "") -> str:
+        """Prompt for Gemini, which caches shared prefixes implicitly"""
+        return f"{system}\n\n{full_prompt}" if system else full_prompt
+    
+    def _generation_config(self, temp: float, json_schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Generation config for Gemini"""
+        config = {
+            'temperature': temp,
+            'max_output_tokens': self.max_tokens,
+        }
+        if json_schema:
+            # Gemini's schema dialect lacks additionalProperties, so only ask for JSON
+            config['response_mime_type'] = "application/json"
+        return config
+    
+    def query_llm(self, prompt: str, context: str = "", temperature: Optional[float] = None,
+                  system: str = "", json_schema: Optional[Dict[str, Any]] = None,
+                  cache_key: Optional[str] = None, use_cache: bool = True) -> str:
         """
         Send a query to the LLM
         
@@ -57,6 +304,12 @@ class LLMService:
             prompt: The prompt template
             context: Context to include in the query
             temperature: Override default temperature
+            system: Static instructions sent ahead of the prompt (cacheable by the provider)
+            json_schema: Named JSON schema ({"name", "schema"}) the response must follow
+            cache_key: Response cache key to use instead of one derived from the request
+                (which is never set above the cache's temperature limit)
+            use_cache: Read and write the response cache; when False the LLM is always asked
+                and the caller decides what to cache
             
         Returns:
             LLM response as string
@@ -68,92 +321,412 @@ class LLMService:
         full_prompt = f"{prompt}\n\n{context}" if context else prompt
         temp = temperature if temperature is not None else self.temperature
         
+        # Identical low-temperature requests are answered from the cache
+        cache_key = (cache_key or self._cache_key(full_prompt, temp, system)) if use_cache else None
+        if cache_key:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
-            if self.provider == "openai":
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[
-                        {"role": "system", "content": "You are a helpful email assistant."},
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    temperature=temp,
-                    max_tokens=self.max_tokens
-                )
-                return response.choices[0].message.content.strip()
-            
-            elif self.provider == "grok":
-                # Grok uses OpenAI-compatible API
-                response = self.client.chat.completions.create(
-                    model=self.model_name or "grok-beta",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful email assistant."},
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    temperature=temp,
-                    max_tokens=self.max_tokens
-                )
-                return response.choices[0].message.content.strip()
-            
-            elif self.provider == "anthropic":
-                response = self.client.messages.create(
-                    model=self.model_name or "claude-3-sonnet-20240229",
-                    max_tokens=self.max_tokens,
-                    temperature=temp,
-                    messages=[
-                        {"role": "user", "content": full_prompt}
-                    ]
-                )
-                return response.content[0].text.strip()
+            response = self._complete(full_prompt, temp, system, json_schema)
+        except Exception as e:
+            logger.exception("Error calling LLM API")
+            return f"Error: {str(e)}"
+        
+        if cache_key:
+            llm_cache.set(cache_key, response)
+        return response
+    
+    def _cache_key(self, full_prompt: str, temp: float, system: str = "") -> Optional[str]:
+        """Response cache key for a request (None when it must not be cached)"""
+        return llm_cache.cache_key(self.provider, self.model_name, full_prompt, temp, self.max_tokens, system)
+    
+    def _complete(self, full_prompt: str, temp: float, system: str = "",
+                  json_schema: Optional[Dict[str, Any]] = None) -> str:
+        """One completion call"""
+        if self.provider in ("openai", "grok"):
+            # Grok uses OpenAI-compatible API
+            response = self.client.chat.completions.create(**self._chat_request(full_prompt, temp, system, json_schema))
+            return response.choices[0].message.content.strip()
+        
+        elif self.provider == "anthropic":
+            response = self.client.messages.create(**self._messages_request(full_prompt, temp, system, json_schema))
+            return self._message_text(response)
+        
+        elif self.provider == "gemini":
+            response = self.client.generate_content(
+                self._gemini_contents(full_prompt, system),
+                generation_config=self._generation_config(temp, json_schema)
+            )
+            return response.text.strip()
+        
+        return ""
+    
+    def stream_query_llm(self, prompt: str, context: str = "", temperature: Optional[float] = None,
+                         system: str = "", cache_key: Optional[str] = None) -> Iterator[str]:
+        """
+        Send a query to the LLM and yield the response as it is generated
+        
+        Args:
+            prompt: The prompt template
+            context: Context to include in the query
+            temperature: Override default temperature
+            system: Static instructions sent ahead of the prompt (cacheable by the provider)
+            cache_key: Response cache key; a cached response is yielded whole, and a
+                completed stream is stored under it
             
-            elif self.provider == "gemini":
-                response = self.client.generate_content(
-                    full_prompt,
-                    generation_config={
-                        'temperature': temp,
-                        'max_output_tokens': self.max_tokens,
-                    }
-                )
-                return response.text.strip()
+        Yields:
+            Chunks of response text
+        """
+        if not self.client:
+            yield "Error: LLM client not initialized. Please check your API key configuration."
+            return
+        
+        full_prompt = f"{prompt}\n\n{context}" if context else prompt
+        temp = temperature if temperature is not None else self.temperature
+        
+        if cache_key:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        chunks = []
+        try:
+            for chunk in self._stream(full_prompt, temp, system):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            logger.exception("Error calling LLM API")
+            yield f"Error: {str(e)}"
+            return
+        
+        if cache_key:
+            llm_cache.set(cache_key, "".join(chunks).strip())
+    
+    def _stream(self, full_prompt: str, temp: float, system: str = "") -> Iterator[str]:
+        """One streamed completion call"""
+        if self.provider in ("openai", "grok"):
+            stream = self.client.chat.completions.create(**self._chat_request(full_prompt, temp, system), stream=True)
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        
+        elif self.provider == "anthropic":
+            with self.client.messages.stream(**self._messages_request(full_prompt, temp, system)) as stream:
+                yield from stream.text_stream
+        
+        elif self.provider == "gemini":
+            response = self.client.generate_content(
+                self._gemini_contents(full_prompt, system),
+                generation_config=self._generation_config(temp),
+                stream=True
+            )
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+    
+    async def aquery_llm(self, prompt: str, context: str = "", temperature: Optional[float] = None,
+                         system: str = "", json_schema: Optional[Dict[str, Any]] = None,
+                         cache_key: Optional[str] = None, use_cache: bool = True) -> str:
+        """
+        Send a query to the LLM without blocking the event loop
+        
+        Args:
+            prompt: The prompt template
+            context: Context to include in the query
+            temperature: Override default temperature
+            system: Static instructions sent ahead of the prompt (cacheable by the provider)
+            json_schema: Named JSON schema ({"name", "schema"}) the response must follow
+            cache_key: Response cache key to use instead of one derived from the request
+                (which is never set above the cache's temperature limit)
+            use_cache: Read and write the response cache; when False the LLM is always asked
+                and the caller decides what to cache
             
+        Returns:
+            LLM response as string
+        """
+        if not self.client:
+            return "Error: LLM client not initialized. Please check your API key configuration."
+        
+        full_prompt = f"{prompt}\n\n{context}" if context else prompt
+        temp = temperature if temperature is not None else self.temperature
+        
+        cache_key = (cache_key or self._cache_key(full_prompt, temp, system)) if use_cache else None
+        if cache_key:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            response = await self._acomplete(full_prompt, temp, system, json_schema)
         except Exception as e:
-            error_msg = f"Error calling LLM API: {str(e)}"
-            print(error_msg)
+            logger.exception("Error calling LLM API")
             return f"Error: {str(e)}"
+        
+        if cache_key:
+            llm_cache.set(cache_key, response)
+        return response
+    
+    @_retry_on_rate_limit
+    async def _acomplete(self, full_prompt: str, temp: float, system: str = "",
+                         json_schema: Optional[Dict[str, Any]] = None) -> str:
+        """One async completion call, paced by the provider's rate limiter and retried when rate limited"""
+        client = self._get_async_client()
+        limiter = get_rate_limiter(self.provider)
+        # Roughly four characters per token, and the completion counts against the limit too
+        await limiter.acquire((len(system) + len(full_prompt)) // 4 + self.max_tokens)
+        
+        if self.provider in ("openai", "grok"):
+            raw = await client.chat.completions.with_raw_response.create(
+                **self._chat_request(full_prompt, temp, system, json_schema)
+            )
+            limiter.update_from_headers(raw.headers)
+            response = raw.parse()
+            return response.choices[0].message.content.strip()
+        
+        elif self.provider == "anthropic":
+            response = await client.messages.create(**self._messages_request(full_prompt, temp, system, json_schema))
+            return self._message_text(response)
+        
+        elif self.provider == "gemini":
+            response = await client.generate_content_async(
+                self._gemini_contents(full_prompt, system),
+                generation_config=self._generation_config(temp, json_schema)
+            )
+            return response.text.strip()
+        
+        return ""
+    
+    def _format_prompt(self, prompt_template: str, email_data: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Fill a prompt template with the email's sender, subject and body
+        
+        The body is truncated so the whole prompt fits in MAX_INPUT_TOKENS.
+        
+        Returns:
+            Tuple of (static instructions, prompt with the email filled in)
+        """
+        template = prompt_service.compile_template(prompt_template)
+        sender = email_data.get('sender', 'Unknown')
+        subject = email_data.get('subject', '')
+        body = email_data.get('body', '')
+        
+        if body:
+            budget = settings.MAX_INPUT_TOKENS - _template_tokens(prompt_template, self.model_name)
+            header = f"{sender}\n{subject}"
+            # Byte-level BPE never produces more tokens than UTF-8 bytes (a CJK
+            # character can be several tokens), so an email with fewer bytes
+            # than the budget fits without being tokenized
+            if len(header.encode('utf-8')) + len(body.encode('utf-8')) > budget:
+                budget -= count_tokens(header, self.model_name)
+                body = truncate_to_tokens(body, budget, self.model_name)
+        
+        return template.system, template.render(sender=sender, subject=subject, body=body)
+    
+    def lookup_categories(self, emails: List[Dict[str, Any]], prompt_template: str) -> List[Tuple[Optional[str], Any]]:
+        """
+        Look up categories for many emails without the LLM, embedding the ones
+        that reach the similarity lookup in one batch
+        
+        Args:
+            emails: Email dictionaries with sender, subject, body
+            prompt_template: Categorization prompt template
+            
+        Returns:
+            One (category or None, embedding) tuple per email, in input order; pass
+            it to acategorize_email() as cached for the emails without a category
+        """
+        requests = [self._format_prompt(prompt_template, email) + (email,) for email in emails]
+        return self._cached_categories(requests, _prompt_key(prompt_template))
+    
+    def _cached_category(self, system: str, formatted_prompt: str, email_data: Dict[str, Any],
+                         prompt_key: str) -> Tuple[Optional[str], Any]:
+        """
+        Look up a category without the LLM: exact-match cache, sender/content
+        rules, then similar emails categorized with the same prompt
+        
+        Returns:
+            Tuple of (category or None, embedding to store once categorized)
+        """
+        return self._cached_categories([(system, formatted_prompt, email_data)], prompt_key)[0]
+    
+    def _cached_categories(self, requests: List[Tuple[str, str, Dict[str, Any]]],
+                           prompt_key: str) -> List[Tuple[Optional[str], Any]]:
+        """
+        _cached_category() for many (system, prompt, email) requests; emails
+        that reach the similarity lookup are embedded in one batch
+        
+        Returns:
+            One (category or None, embedding) tuple per request, in input order
+        """
+        results: List[Tuple[Optional[str], Any]] = [(None, None)] * len(requests)
+        unresolved = []
+        
+        for i, (system, formatted_prompt, email_data) in enumerate(requests):
+            cache_key = self._cache_key(formatted_prompt, 0.3, system)
+            cached = llm_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                results[i] = self._parse_category(cached), None
+                continue
+            
+            category = self._cheap_classify(email_data)
+            if category:
+                results[i] = category, None
+            else:
+                unresolved.append((i, cache_key))
+        
+        matches = semantic_cache.lookup_many([requests[i][2] for i, _ in unresolved], prompt_key)
+        for (i, cache_key), (category, embedding) in zip(unresolved, matches):
+            if category and cache_key:
+                # Backfill the exact-match cache so this prompt skips the embedding next time
+                llm_cache.set(cache_key, category)
+            results[i] = category, embedding
+        
+        return results
+    
+    def _remember_category(self, system: str, formatted_prompt: str, category: str,
+                           embedding: Any, prompt_key: str):
+        """Cache a category the LLM gave; "Uncategorized" (an unparseable answer) is not kept"""
+        if category == "Uncategorized":
+            return
+        
+        cache_key = self._cache_key(formatted_prompt, 0.3, system)
+        if cache_key:
+            llm_cache.set(cache_key, category)
+        semantic_cache.add(embedding, category, prompt_key)
+    
+    @staticmethod
+    def _cheap_classify(email_data: Dict[str, Any]) -> Optional[str]:
+        """
+        Categorize obvious cases with rules instead of the LLM
+        
+        Returns:
+            "Spam" for blacklisted sender domains, "Newsletter" for bulk senders
+            or unsubscribe footers, otherwise None
+        """
+        sender = email_data.get('sender') or ''
+        
+        if _SPAM_SENDER_RE and _SPAM_SENDER_RE.search(sender):
+            return "Spam"
+        if _BULK_SENDER_RE.search(sender) or "unsubscribe" in (email_data.get('body') or '').lower():
+            return "Newsletter"
+        return None
+    
+    @staticmethod
+    def _parse_category(response: str) -> str:
+        """Map a categorization response to a known category"""
+        match = _CATEGORY_RE.search(response)
+        return match.group(1).title() if match else "Uncategorized"
+    
+    @staticmethod
+    def _parse_action_items(response: str) -> list:
+        """Parse the list of action items from an extraction response"""
+        try:
+            action_items = json.loads(response)
+        except json.JSONDecodeError:
+            # Free text (fenced or with commentary): take the outermost JSON array
+            match = _JSON_ARRAY_RE.search(response)
+            try:
+                action_items = json.loads(match.group(0)) if match else None
+            except json.JSONDecodeError:
+                action_items = None
+        
+        # Structured outputs wrap the list in an object
+        if isinstance(action_items, dict):
+            action_items = action_items.get('action_items')
+        
+        if isinstance(action_items, list):
+            return action_items
+        
+        logger.warning("Failed to parse action items JSON: %s", response)
+        return []
     
-    def categorize_email(self, email_data: Dict[str, Any], prompt_template: str) -> str:
+    def categorize_email(self, email_data: Dict[str, Any], prompt_template: str,
+                         use_cache: bool = True) -> str:
         """
         Categorize an email using the LLM
         
         Args:
             email_data: Email dictionary with sender, subject, body
             prompt_template: Categorization prompt template
+            use_cache: Answer from the caches and sender rules when possible; when
+                False the LLM is always asked (a valid answer still refreshes the cache)
             
         Returns:
             Category name (Important, Newsletter, Spam, To-Do, or Uncategorized)
         """
-        # Format the prompt with email data
-        formatted_prompt = prompt_template.format(
-            sender=email_data.get('sender', 'Unknown'),
-            subject=email_data.get('subject', ''),
-            body=email_data.get('body', '')
-        )
+        system, formatted_prompt = self._format_prompt(prompt_template, email_data)
+        prompt_key = _prompt_key(prompt_template)
+        category, embedding = None, None
+        if use_cache:
+            category, embedding = self._cached_category(system, formatted_prompt, email_data, prompt_key)
+        if category:
+            return category
         
-        response = self.query_llm(formatted_prompt, temperature=0.3)
+        # The exact-match cache was already checked above; only answers that
+        # parse are cached, so a failed one is retried next time
+        response = self.query_llm(formatted_prompt, temperature=0.3, system=system, use_cache=False)
+        category = self._parse_category(response)
+        self._remember_category(system, formatted_prompt, category, embedding, prompt_key)
+        return category
+    
+    def extract_action_items(self, email_data: Dict[str, Any], prompt_template: str,
+                             use_cache: bool = True) -> list:
+        """
+        Extract action items from an email
         
-        # Clean up the response and validate
-        category = response.strip()
-        valid_categories = ["Important", "Newsletter", "Spam", "To-Do"]
+        Args:
+            email_data: Email dictionary with sender, subject, body
+            prompt_template: Action item extraction prompt template
+            use_cache: Answer from the response cache when possible
+            
+        Returns:
+            List of action items, each with 'task' and 'deadline'
+        """
+        system, formatted_prompt = self._format_prompt(prompt_template, email_data)
+        response = self.query_llm(formatted_prompt, temperature=0.2, system=system, json_schema=ACTION_ITEMS_SCHEMA,
+                                  use_cache=use_cache)
+        return self._parse_action_items(response)
+    
+    async def acategorize_email(self, email_data: Dict[str, Any], prompt_template: str,
+                                use_cache: bool = True,
+                                cached: Optional[Tuple[Optional[str], Any]] = None) -> str:
+        """
+        Categorize an email using the LLM (async)
         
-        # Check if response contains a valid category
-        for valid_cat in valid_categories:
-            if valid_cat.lower() in category.lower():
-                return valid_cat
+        Args:
+            email_data: Email dictionary with sender, subject, body
+            prompt_template: Categorization prompt template
+            use_cache: Answer from the caches and sender rules when possible; when
+                False the LLM is always asked (a valid answer still refreshes the cache)
+            cached: This email's entry from lookup_categories(), when the caches were
+                already checked for a whole run; they are not consulted again
+            
+        Returns:
+            Category name (Important, Newsletter, Spam, To-Do, or Uncategorized)
+        """
+        system, formatted_prompt = self._format_prompt(prompt_template, email_data)
+        prompt_key = _prompt_key(prompt_template)
+        category, embedding = None, None
+        if cached is not None:
+            category, embedding = cached
+        elif use_cache:
+            category, embedding = self._cached_category(system, formatted_prompt, email_data, prompt_key)
+        if category:
+            return category
         
-        return "Uncategorized"
+        # The exact-match cache was already checked above; only answers that
+        # parse are cached, so a failed one is retried next time
+        response = await self.aquery_llm(formatted_prompt, temperature=0.3, system=system, use_cache=False)
+        category = self._parse_category(response)
+        self._remember_category(system, formatted_prompt, category, embedding, prompt_key)
+        return category
     
-    def extract_action_items(self, email_data: Dict[str, Any], prompt_template: str) -> list:
+    async def aextract_action_items(self, email_data: Dict[str, Any], prompt_template: str) -> list:
         """
-        Extract action items from an email
+        Extract action items from an email (async)
         
         Args:
             email_data: Email dictionary with sender, subject, body
@@ -162,36 +735,216 @@ class LLMService:
         Returns:
             List of action items, each with 'task' and 'deadline'
         """
-        # Format the prompt with email data
-        formatted_prompt = prompt_template.format(
-            sender=email_data.get('sender', 'Unknown'),
-            subject=email_data.get('subject', ''),
-            body=email_data.get('body', '')
-        )
-        
-        response = self.query_llm(formatted_prompt, temperature=0.2)
+        system, formatted_prompt = self._format_prompt(prompt_template, email_data)
+        response = await self.aquery_llm(formatted_prompt, temperature=0.2, system=system,
+                                         json_schema=ACTION_ITEMS_SCHEMA)
+        return self._parse_action_items(response)
+    
+    @property
+    def supports_batch(self) -> bool:
+        """Whether the provider offers a discounted asynchronous Batch API"""
+        return self.client is not None and self.provider in ("openai", "anthropic")
+    
+    def batch_categorize(self, emails: List[Dict[str, Any]], prompt_template: str,
+                         progress_callback: Optional[Callable[[int, int, str], None]] = None) -> List[Optional[str]]:
+        """
+        Categorize emails through the provider's Batch API
         
-        # Try to parse JSON response
-        try:
-            # Clean up response (remove markdown code blocks if present)
-            cleaned_response = response.strip()
-            if cleaned_response.startswith('```'):
-                # Extract JSON from markdown code block
-                lines = cleaned_response.split('\n')
-                cleaned_response = '\n'.join(lines[1:-1]) if len(lines) > 2 else cleaned_response
+        Args:
+            emails: Email dictionaries with sender, subject, body
+            prompt_template: Categorization prompt template
+            progress_callback: Optional callback function(current, total, status) while polling
             
-            action_items = json.loads(cleaned_response)
+        Returns:
+            Category per email, in input order; None where the batch returned no answer
+        """
+        categories: List[Optional[str]] = [None] * len(emails)
+        pending = []
+        
+        prompt_key = _prompt_key(prompt_template)
+        for i, (category, embedding) in enumerate(self.lookup_categories(emails, prompt_template)):
+            if category:
+                categories[i] = category
+            else:
+                system, formatted_prompt = self._format_prompt(prompt_template, emails[i])
+                pending.append((i, embedding, (system, formatted_prompt, 0.3)))
+        
+        # Cached answers were resolved above; only ones that parse are cached below
+        responses = self._run_batch([request for _, _, request in pending], progress_callback, use_cache=False)
+        
+        learned = []
+        for (i, embedding, (system, formatted_prompt, temp)), response in zip(pending, responses):
+            if response is None:
+                # Errored or expired in the batch; not the model's answer
+                continue
+            category = self._parse_category(response)
+            if category != "Uncategorized":
+                cache_key = self._cache_key(formatted_prompt, temp, system)
+                if cache_key:
+                    llm_cache.set(cache_key, category)
+                learned.append((embedding, category))
+            categories[i] = category
+        
+        semantic_cache.add_many([embedding for embedding, _ in learned], [category for _, category in learned],
+                                prompt_key)
+        return categories
+    
+    def batch_extract_action_items(self, emails: List[Dict[str, Any]], prompt_template: str,
+                                   progress_callback: Optional[Callable[[int, int, str], None]] = None) -> List[list]:
+        """
+        Extract action items from emails through the provider's Batch API
+        
+        Args:
+            emails: Email dictionaries with sender, subject, body
+            prompt_template: Action item extraction prompt template
+            progress_callback: Optional callback function(current, total, status) while polling
             
-            # Validate structure
-            if isinstance(action_items, list):
-                return action_items
+        Returns:
+            List of action items per email, in input order; None where the batch returned no answer
+        """
+        requests = [self._format_prompt(prompt_template, email) + (0.2,) for email in emails]
+        responses = self._run_batch(requests, progress_callback, json_schema=ACTION_ITEMS_SCHEMA)
+        return [self._parse_action_items(response) if response is not None else None for response in responses]
+    
+    def _run_batch(self, requests: List[Tuple[str, str, float]],
+                   progress_callback: Optional[Callable[[int, int, str], None]] = None,
+                   poll_interval: float = 10.0,
+                   json_schema: Optional[Dict[str, Any]] = None,
+                   use_cache: bool = True) -> List[Optional[str]]:
+        """
+        Submit (system, prompt, temperature) requests as one batch and wait for the results
+        
+        Args:
+            requests: (system, prompt, temperature) per request
+            progress_callback: Optional callback function(current, total, status) while polling
+            poll_interval: Seconds between batch status checks
+            json_schema: Named JSON schema every response must follow
+            use_cache: Answer from and store into the response cache
+        
+        Returns:
+            Response text per request, or None where the request failed
+        """
+        results: List[Optional[str]] = [None] * len(requests)
+        cache_keys = [self._cache_key(prompt, temp, system) if use_cache else None
+                      for system, prompt, temp in requests]
+        
+        # Only submit requests the response cache can't answer
+        pending = []
+        for i, key in enumerate(cache_keys):
+            cached = llm_cache.get(key) if key else None
+            if cached is not None:
+                results[i] = cached
             else:
-                return []
-        except json.JSONDecodeError:
-            print(f"Failed to parse action items JSON: {response}")
-            return []
+                pending.append(i)
+        
+        if not pending:
+            return results
+        
+        if self.provider == "openai":
+            responses = self._run_openai_batch([requests[i] for i in pending], progress_callback, poll_interval,
+                                               json_schema)
+        else:
+            responses = self._run_anthropic_batch([requests[i] for i in pending], progress_callback, poll_interval,
+                                                  json_schema)
+        
+        for i, response in zip(pending, responses):
+            results[i] = response
+            if response is not None and cache_keys[i]:
+                llm_cache.set(cache_keys[i], response)
+        
+        return results
+    
+    def _run_openai_batch(self, requests: List[Tuple[str, str, float]],
+                          progress_callback: Optional[Callable[[int, int, str], None]],
+                          poll_interval: float,
+                          json_schema: Optional[Dict[str, Any]] = None) -> List[Optional[str]]:
+        """
+        Run requests through the OpenAI Batch API (JSONL file upload, poll, download)
+        
+        Raises:
+            RuntimeError: If the batch failed, expired or was cancelled
+        """
+        lines = [
+            json.dumps({
+                "custom_id": f"req-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._chat_request(prompt, temp, system, json_schema)
+            })
+            for i, (system, prompt, temp) in enumerate(requests)
+        ]
+        batch_file = self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode('utf-8')),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        
+        total = len(requests)
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if progress_callback:
+                done = batch.request_counts.completed if batch.request_counts else 0
+                progress_callback(done, total, f"Batch {batch.status}: {done}/{total} requests done")
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"OpenAI batch {batch.id} ended with status {batch.status}")
+        
+        results: List[Optional[str]] = [None] * total
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get('response') or {}
+            if response.get('status_code') == 200:
+                index = int(record['custom_id'].split('-', 1)[1])
+                results[index] = response['body']['choices'][0]['message']['content'].strip()
+        
+        return results
+    
+    def _run_anthropic_batch(self, requests: List[Tuple[str, str, float]],
+                             progress_callback: Optional[Callable[[int, int, str], None]],
+                             poll_interval: float,
+                             json_schema: Optional[Dict[str, Any]] = None) -> List[Optional[str]]:
+        """
+        Run requests through the Anthropic Message Batches API
+        
+        Raises:
+            RuntimeError: If no request in the batch succeeded (it was cancelled or expired)
+        """
+        batch = self.client.messages.batches.create(requests=[
+            {"custom_id": f"req-{i}", "params": self._messages_request(prompt, temp, system, json_schema)}
+            for i, (system, prompt, temp) in enumerate(requests)
+        ])
+        
+        total = len(requests)
+        while batch.processing_status != "ended":
+            if progress_callback:
+                counts = batch.request_counts
+                done = total - counts.processing
+                progress_callback(done, total, f"Batch {batch.processing_status}: {done}/{total} requests done")
+            time.sleep(poll_interval)
+            batch = self.client.messages.batches.retrieve(batch.id)
+        
+        if not batch.request_counts.succeeded:
+            counts = batch.request_counts
+            raise RuntimeError(f"Anthropic batch {batch.id} ended with no successes "
+                               f"({counts.errored} errored, {counts.expired} expired, {counts.canceled} canceled)")
+        
+        results: List[Optional[str]] = [None] * total
+        for entry in self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                index = int(entry.custom_id.split('-', 1)[1])
+                results[index] = self._message_text(entry.result.message)
+        
+        return results
     
-    def generate_reply_draft(self, email_data: Dict[str, Any], prompt_template: str, user_tone: str = "professional") -> str:
+    def generate_reply_draft(self, email_data: Dict[str, Any], prompt_template: str, user_tone: str = "professional",
+                             on_chunk: Optional[Callable[[str], None]] = None) -> str:
         """
         Generate a reply draft for an email
         
@@ -199,21 +952,25 @@ class LLMService:
             email_data: Email dictionary with sender, subject, body
             prompt_template: Auto-reply prompt template
             user_tone: Tone preference for the reply
+            on_chunk: Optional callback receiving the reply text as it streams in
             
         Returns:
             Generated reply body
         """
         # Format the prompt with email data
-        formatted_prompt = prompt_template.format(
-            sender=email_data.get('sender', 'Unknown'),
-            subject=email_data.get('subject', ''),
-            body=email_data.get('body', '')
-        )
+        system, formatted_prompt = self._format_prompt(prompt_template, email_data)
         
         if user_tone != "professional":
             formatted_prompt += f"\n\nTone: {user_tone}"
         
-        response = self.query_llm(formatted_prompt, temperature=0.7)
+        if on_chunk:
+            chunks = []
+            for chunk in self.stream_query_llm(formatted_prompt, temperature=0.7, system=system):
+                chunks.append(chunk)
+                on_chunk(chunk)
+            return "".join(chunks).strip()
+        
+        response = self.query_llm(formatted_prompt, temperature=0.7, system=system)
         
         return response.strip()
     
@@ -228,14 +985,38 @@ class LLMService:
         Returns:
             AI response
         """
-        if context:
-            full_prompt = f"Context:\n{context}\n\nUser Question: {query}\n\nProvide a helpful response."
-        else:
-            full_prompt = query
-        
-        response = self.query_llm(full_prompt, temperature=0.7)
+        with self._chat_slots:
+            response = self.query_llm(self._chat_prompt(query, context), temperature=0.7,
+                                      cache_key=self._chat_cache_key(query, context))
         
         return response
+    
+    def handle_chat_query_stream(self, query: str, context: str = "") -> Iterator[str]:
+        """
+        Handle a chat query from the user, yielding the response as it is generated
+        
+        Args:
+            query: User's question
+            context: Context (e.g., selected email content)
+            
+        Yields:
+            Chunks of AI response
+        """
+        # The slot is held until the stream finishes or is abandoned (closed)
+        with self._chat_slots:
+            yield from self.stream_query_llm(self._chat_prompt(query, context), temperature=0.7,
+                                             cache_key=self._chat_cache_key(query, context))
+    
+    def _chat_cache_key(self, query: str, context: str = "") -> Optional[str]:
+        """Response cache key for a chat query; repeated questions about the same context reuse the answer"""
+        return llm_cache.chat_key(self.provider, self.model_name, query, context)
+    
+    @staticmethod
+    def _chat_prompt(query: str, context: str = "") -> str:
+        """Prompt for a chat query, with the context ahead of the question"""
+        if context:
+            return f"Context:\n{context}\n\nUser Question: {query}\n\nProvide a helpful response."
+        return query
 
 
 # Create a singleton instance
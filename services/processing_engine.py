@@ -1,10 +1,38 @@
 """Processing Engine - Orchestrates email processing with LLM"""
-from typing import List, Dict, Any, Callable
+import re
+import asyncio
+import hashlib
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from config.settings import settings
 from services.llm_service import llm_service
 from services.prompt_service import prompt_service
 from services.email_service import email_service
 
 
+# Emails whose results are written per transaction in process_inbox
+_FLUSH_EVERY = 100
+
+
+# Requests, deadlines and dates; a To-Do email without any of these has no
+# task for extraction to find
+_ACTION_CUES_RE = re.compile(
+    r"\b(please|kindly|by|before|deadline|due|submit|review|complete|send|reply|respond|due date|schedule)\b"
+    r"|\b\d{1,2}[/-]\d{1,2}\b",
+    re.IGNORECASE
+)
+
+
+def _has_action_cues(body: Optional[str]) -> bool:
+    """Whether an email body could contain an action item"""
+    return bool(body) and _ACTION_CUES_RE.search(body) is not None
+
+
+def _content_key(email: Dict[str, Any]) -> bytes:
+    """Digest of the fields the LLM sees; emails with the same key get the same results"""
+    content = "\0".join((email.get('sender') or '', email.get('subject') or '', email.get('body') or ''))
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+
 class ProcessingEngine:
     """Engine for processing emails through the LLM pipeline"""
     
@@ -13,19 +41,22 @@ class ProcessingEngine:
         self.prompt_svc = prompt_service
         self.email_svc = email_service
     
-    def process_inbox(self, progress_callback: Callable[[int, int, str], None] = None) -> Dict[str, Any]:
+    def process_inbox(self, progress_callback: Callable[[int, int, str], None] = None,
+                      use_batch_api: Optional[bool] = None) -> Dict[str, Any]:
         """
         Process all emails in the inbox
         
         Args:
             progress_callback: Optional callback function(current, total, status)
+            use_batch_api: Submit through the provider's discounted Batch API
+                (OpenAI/Anthropic) and wait for it, which can take hours; defaults
+                to the LLM_USE_BATCH_API setting
             
         Returns:
             Dictionary with processing results
         """
-        # Get all uncategorized emails
-        all_emails = self.email_svc.get_all_emails()
-        uncategorized = [e for e in all_emails if e['category'] == 'Uncategorized']
+        # Get all uncategorized emails (filtered in SQL on the category index)
+        uncategorized = self.email_svc.get_all_emails(category_filter='Uncategorized')
         
         total = len(uncategorized)
         processed = 0
@@ -44,28 +75,64 @@ class ProcessingEngine:
                 'errors': ['Missing prompts']
             }
         
+        # Identical emails (repeated newsletters, re-sent threads) go to the LLM
+        # once; their results are fanned out to every copy below
+        groups: Dict[bytes, List[Dict[str, Any]]] = {}
         for email in uncategorized:
-            processed += 1
+            groups.setdefault(_content_key(email), []).append(email)
+        group_list = list(groups.values())
+        unique = [group[0] for group in group_list]
+        
+        if use_batch_api is None:
+            use_batch_api = settings.LLM_USE_BATCH_API
+        
+        # Results are written as they arrive, one transaction per _FLUSH_EVERY
+        # emails rather than a commit per row, so a run that dies partway keeps
+        # what it finished
+        categories = []
+        action_items = []
+        recorded = set()
+        
+        def record(index: int, result: Any):
+            nonlocal processed
+            recorded.add(index)
             
-            if progress_callback:
-                progress_callback(processed, total, f"Processing: {email['subject'][:50]}...")
+            for email in group_list[index]:
+                processed += 1
+                
+                if isinstance(result, Exception):
+                    errors.append(f"Error processing email {email['id']}: {str(result)}")
+                    continue
+                
+                category, items = result
+                categories.append((email['id'], category))
+                
+                if isinstance(items, Exception):
+                    errors.append(f"Error processing email {email['id']}: {str(items)}")
+                elif items:
+                    action_items.extend(
+                        {'email_id': email['id'], **item} for item in items if isinstance(item, dict)
+                    )
             
+            if len(categories) >= _FLUSH_EVERY:
+                self._flush_results(categories, action_items, errors)
+        
+        if use_batch_api and unique and self.llm.supports_batch:
             try:
-                # Step 1: Categorize email
-                category = self.llm.categorize_email(email, cat_prompt)
-                self.email_svc.update_category(email['id'], category)
-                
-                # Step 2: Extract action items (only for To-Do emails)
-                if category == "To-Do":
-                    action_items = self.llm.extract_action_items(email, action_prompt)
-                    for item in action_items:
-                        self.email_svc.add_action_item(
-                            email['id'],
-                            item.get('task', ''),
-                            item.get('deadline', 'Not specified')
-                        )
+                self._process_batch(unique, cat_prompt, action_prompt, record, progress_callback)
             except Exception as e:
-                errors.append(f"Error processing email {email['id']}: {str(e)}")
+                errors.append(f"Batch API failed, processed concurrently instead: {str(e)}")
+        
+        # Run the LLM calls concurrently for everything the batch didn't cover
+        remaining = [i for i in range(len(unique)) if i not in recorded]
+        if remaining:
+            asyncio.run(self._process_concurrently(
+                [unique[i] for i in remaining], cat_prompt, action_prompt,
+                lambda position, result: record(remaining[position], result),
+                progress_callback
+            ))
+        
+        self._flush_results(categories, action_items, errors)
         
         return {
             'success': True,
@@ -75,12 +142,112 @@ class ProcessingEngine:
             'errors': errors
         }
     
-    def process_single_email(self, email_id: str) -> Dict[str, Any]:
+    def _flush_results(self, categories: List[Tuple[str, str]], action_items: List[Dict[str, Any]], errors: List[str]):
+        """Write accumulated categories and action items, then clear the buffers"""
+        try:
+            self.email_svc.bulk_update_categories(categories)
+            self.email_svc.bulk_add_action_items(action_items)
+        except Exception as e:
+            errors.append(f"Error saving results for {len(categories)} emails: {str(e)}")
+        
+        categories.clear()
+        action_items.clear()
+    
+    def _process_batch(self, emails: List[Dict[str, Any]], cat_prompt: str, action_prompt: str,
+                       on_result: Callable[[int, Any], None],
+                       progress_callback: Optional[Callable[[int, int, str], None]] = None):
+        """
+        Categorize emails, then extract action items from the actionable To-Do ones, as two Batch API jobs
+        
+        Emails with nothing to extract are reported as soon as the categorization job
+        is done, the rest once extraction is. Emails the batch returned no answer
+        for are not reported, so the caller can process them another way.
+        
+        Args:
+            emails: Emails to process
+            cat_prompt: Categorization prompt template
+            action_prompt: Action item extraction prompt template
+            on_result: Called with (index, (category, action_items)) per email
+            progress_callback: Optional callback function(current, total, status)
+        """
+        categories = self.llm.batch_categorize(emails, cat_prompt, progress_callback)
+        
+        todo = []
+        for i, category in enumerate(categories):
+            if category is None:
+                continue
+            if category == "To-Do" and _has_action_cues(emails[i].get('body')):
+                todo.append(i)
+            else:
+                on_result(i, (category, []))
+        
+        extracted = self.llm.batch_extract_action_items([emails[i] for i in todo], action_prompt, progress_callback)
+        for i, items in zip(todo, extracted):
+            if items is not None:
+                on_result(i, (categories[i], items))
+    
+    async def _process_concurrently(self, emails: List[Dict[str, Any]], cat_prompt: str, action_prompt: str,
+                                    on_result: Callable[[int, Any], None],
+                                    progress_callback: Optional[Callable[[int, int, str], None]] = None):
+        """
+        Categorize emails and extract action items with bounded concurrency
+        
+        Args:
+            emails: Emails to process
+            cat_prompt: Categorization prompt template
+            action_prompt: Action item extraction prompt template
+            on_result: Called as each email finishes with (index, result), where result
+                is a (category, action_items) tuple or the exception that stopped it;
+                action_items is the exception instead when only extraction failed
+            progress_callback: Optional callback function(current, total, status)
+        """
+        semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        total = len(emails)
+        completed = 0
+        
+        # Check the caches for every email up front, with the similarity lookup
+        # embedding them in one batch; only the misses go to the LLM below
+        cached = self.llm.lookup_categories(emails, cat_prompt)
+        
+        async def _process(email: Dict[str, Any], cached_category: Tuple[Optional[str], Any]) -> Tuple[str, list]:
+            nonlocal completed
+            async with semaphore:
+                # Step 1: Categorize email
+                category = await self.llm.acategorize_email(email, cat_prompt, cached=cached_category)
+                
+                # Step 2: Extract action items (only for To-Do emails that look
+                # actionable); a failure here is reported without discarding the category
+                action_items = []
+                if category == "To-Do" and _has_action_cues(email.get('body')):
+                    try:
+                        action_items = await self.llm.aextract_action_items(email, action_prompt)
+                    except Exception as e:
+                        action_items = e
+            
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, total, f"Processed: {email['subject'][:50]}...")
+            return category, action_items
+        
+        async def _process_and_report(index: int, email: Dict[str, Any]):
+            try:
+                result = await _process(email, cached[index])
+            except Exception as e:
+                result = e
+            on_result(index, result)
+        
+        try:
+            await asyncio.gather(*[_process_and_report(i, e) for i, e in enumerate(emails)])
+        finally:
+            await self.llm.aclose()
+    
+    def process_single_email(self, email_id: str, use_cache: bool = True) -> Dict[str, Any]:
         """
         Process a single email
         
         Args:
             email_id: ID of email to process
+            use_cache: Reuse cached LLM answers; pass False to ask the LLM again
             
         Returns:
             Dictionary with processing results
@@ -105,20 +272,15 @@ class ProcessingEngine:
         
         try:
             # Categorize
-            category = self.llm.categorize_email(email, cat_prompt)
+            category = self.llm.categorize_email(email, cat_prompt, use_cache=use_cache)
             self.email_svc.update_category(email_id, category)
             
             # Extract action items if To-Do
             action_items = []
             if category == "To-Do":
-                items = self.llm.extract_action_items(email, action_prompt)
-                for item in items:
-                    item_id = self.email_svc.add_action_item(
-                        email_id,
-                        item.get('task', ''),
-                        item.get('deadline', 'Not specified')
-                    )
-                    action_items.append(item)
+                items = self.llm.extract_action_items(email, action_prompt, use_cache=use_cache)
+                self.email_svc.add_action_items_bulk(email_id, items)
+                action_items.extend(items)
             
             return {
                 'success': True,
@@ -132,13 +294,15 @@ class ProcessingEngine:
                 'message': f'Error processing email: {str(e)}'
             }
     
-    def generate_draft_for_email(self, email_id: str, tone: str = "professional") -> Dict[str, Any]:
+    def generate_draft_for_email(self, email_id: str, tone: str = "professional",
+                                 on_chunk: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
         Generate a reply draft for an email
         
         Args:
             email_id: ID of email to reply to
             tone: Reply tone
+            on_chunk: Optional callback receiving the draft body as it streams in
             
         Returns:
             Dictionary with draft content
@@ -162,7 +326,7 @@ class ProcessingEngine:
         
         try:
             # Generate draft
-            draft_body = self.llm.generate_reply_draft(email, reply_prompt, tone)
+            draft_body = self.llm.generate_reply_draft(email, reply_prompt, tone, on_chunk=on_chunk)
             draft_subject = f"Re: {email['subject']}"
             
             return {
@@ -194,10 +358,11 @@ class ProcessingEngine:
             return "Error: Prompt not found"
         
         try:
+            # Always ask the LLM; a cached answer wouldn't test the prompt
             if prompt_type == "categorization":
-                return self.llm.categorize_email(sample_email, prompt)
+                return self.llm.categorize_email(sample_email, prompt, use_cache=False)
             elif prompt_type == "action_item":
-                items = self.llm.extract_action_items(sample_email, prompt)
+                items = self.llm.extract_action_items(sample_email, prompt, use_cache=False)
                 return str(items)
             elif prompt_type == "auto_reply":
                 return self.llm.generate_reply_draft(sample_email, prompt)
@@ -207,13 +372,13 @@ class ProcessingEngine:
             return f"Error testing prompt: {str(e)}"
 
 
-    def process_email(self, email_id: str) -> Dict[str, Any]:
+    def process_email(self, email_id: str, use_cache: bool = True) -> Dict[str, Any]:
         """Wrapper for process_single_email to match UI calls"""
-        return self.process_single_email(email_id)
+        return self.process_single_email(email_id, use_cache=use_cache)
 
-    def generate_draft(self, email_id: str) -> Dict[str, Any]:
+    def generate_draft(self, email_id: str, on_chunk: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """Wrapper for generate_draft_for_email to match UI calls"""
-        result = self.generate_draft_for_email(email_id)
+        result = self.generate_draft_for_email(email_id, on_chunk=on_chunk)
         if result['success']:
             # Return just the draft dict if successful, or None
             from models.database import DraftModel
@@ -1,13 +1,72 @@
 """Prompt Service - Manages prompt templates"""
+import re
 import json
-from typing import Dict, Optional
+import functools
+from typing import Dict, Optional, Tuple
 from models.database import PromptModel
 from config.settings import settings
 
 
+# Only these placeholders are substituted; any other braces (e.g. JSON examples) are literal text
+_PLACEHOLDER_RE = re.compile(r"\{(sender|subject|body)\}")
+
+
+class PromptTemplate:
+    """A prompt template parsed once into static instructions and a fast email renderer"""
+    
+    def __init__(self, template: str):
+        # Split at the paragraph break before the first email placeholder, so
+        # the instructions are byte-identical across emails and can be served
+        # from the provider's prompt cache
+        first = _PLACEHOLDER_RE.search(template)
+        cut = template.rfind("\n\n", 0, first.start()) if first else -1
+        
+        if cut == -1:
+            self.system, email_part = "", template
+        else:
+            self.system, email_part = template[:cut].strip(), template[cut:].strip()
+        
+        # Precompiled to a %-format string: literal % is escaped and only known
+        # placeholders become %(name)s, so rendering is a single C-level substitution
+        self._format = _PLACEHOLDER_RE.sub(r"%(\1)s", email_part.replace("%", "%%"))
+    
+    def render(self, sender: str = "", subject: str = "", body: str = "") -> str:
+        """Fill in the email part of the template"""
+        return self._format % {'sender': sender, 'subject': subject, 'body': body}
+
+
 class PromptService:
     """Service for managing prompt templates"""
     
+    # prompt_type -> (content, compiled template); prompts change rarely, so
+    # reads are served from here and writes invalidate the entry
+    _cache: Dict[str, Tuple[str, PromptTemplate]] = {}
+    
+    @classmethod
+    def invalidate(cls, prompt_type: Optional[str] = None):
+        """
+        Drop cached prompts
+        
+        Args:
+            prompt_type: Prompt to drop, or None to drop all of them
+        """
+        if prompt_type is None:
+            cls._cache.clear()
+        else:
+            cls._cache.pop(prompt_type, None)
+    
+    @classmethod
+    def _get_cached(cls, prompt_type: str) -> Optional[Tuple[str, PromptTemplate]]:
+        """Get (content, compiled template) for a prompt, loading it on a miss"""
+        entry = cls._cache.get(prompt_type)
+        if entry is None:
+            prompt = PromptModel.get_by_name(prompt_type)
+            if not prompt:
+                return None
+            entry = (prompt['content'], PromptService.compile_template(prompt['content']))
+            cls._cache[prompt_type] = entry
+        return entry
+    
     @staticmethod
     def load_default_prompts():
         """Load default prompts from JSON file and store in database"""
@@ -21,6 +80,7 @@ class PromptService:
                     content=prompt_info['content'],
                     is_active=True
                 )
+                PromptService.invalidate(prompt_type)
             
             return True, "Default prompts loaded successfully"
         except FileNotFoundError:
@@ -39,11 +99,46 @@ class PromptService:
         Returns:
             Prompt content string or None
         """
-        prompt = PromptModel.get_by_name(prompt_type)
-        if prompt:
-            return prompt['content']
+        entry = PromptService._get_cached(prompt_type)
+        if entry:
+            return entry[0]
         return None
     
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def compile_template(template: str) -> PromptTemplate:
+        """
+        Parse a prompt template once; repeated calls with the same text reuse it
+        
+        Args:
+            template: Prompt content
+            
+        Returns:
+            Compiled PromptTemplate
+        """
+        return PromptTemplate(template)
+    
+    @staticmethod
+    def render(prompt_type: str, sender: str = "", subject: str = "", body: str = "") -> Optional[Tuple[str, str]]:
+        """
+        Render a stored prompt for an email
+        
+        Args:
+            prompt_type: Type of prompt (categorization, action_item, auto_reply)
+            sender: Email sender
+            subject: Email subject
+            body: Email body
+            
+        Returns:
+            Tuple of (static instructions, rendered email prompt) or None if the prompt is missing
+        """
+        entry = PromptService._get_cached(prompt_type)
+        if entry is None:
+            return None
+        
+        compiled = entry[1]
+        return compiled.system, compiled.render(sender, subject, body)
+    
     @staticmethod
     def update_prompt(prompt_type: str, new_content: str) -> bool:
         """
@@ -56,7 +151,9 @@ class PromptService:
         Returns:
             True if successful, False otherwise
         """
-        return PromptModel.update(prompt_type, new_content)
+        success = PromptModel.update(prompt_type, new_content)
+        PromptService.invalidate(prompt_type)
+        return success
     
     @staticmethod
     def create_prompt(prompt_type: str, content: str) -> int:
@@ -70,7 +167,9 @@ class PromptService:
         Returns:
             ID of created prompt
         """
-        return PromptModel.insert(prompt_type, content, is_active=True)
+        prompt_id = PromptModel.insert(prompt_type, content, is_active=True)
+        PromptService.invalidate(prompt_type)
+        return prompt_id
     
     @staticmethod
     def get_all_prompts() -> Dict[str, str]:
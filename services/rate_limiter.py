@@ -0,0 +1,102 @@
+"""Rate Limiter - Keeps async LLM calls within a provider's request and token limits"""
+import re
+import time
+import asyncio
+import weakref
+import functools
+from typing import Mapping, Optional
+from aiolimiter import AsyncLimiter
+from config.settings import settings
+
+
+# Durations in x-ratelimit-reset-* headers, e.g. "1s", "6m0s", "20ms"
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in a duration header value, or None if it doesn't parse"""
+    parts = _DURATION_PART_RE.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Delay asked for by a rate-limited response (Retry-After in seconds, or OpenAI's retry-after-ms)"""
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        # HTTP-date form; let the caller fall back to its own backoff
+        pass
+    return None
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one provider"""
+    
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._paused_until = 0.0
+        # aiolimiter binds a limiter to one event loop, and concurrent sessions
+        # each run their own loop, so every loop keeps its own buckets
+        self._loop_buckets = weakref.WeakKeyDictionary()
+    
+    def _buckets(self):
+        """The running loop's buckets, rebuilt if the limits changed since they were made"""
+        loop = asyncio.get_running_loop()
+        limits = (self.requests_per_minute, self.tokens_per_minute)
+        entry = self._loop_buckets.get(loop)
+        if entry is None or entry[0] != limits:
+            request_bucket = AsyncLimiter(self.requests_per_minute, 60)
+            token_bucket = AsyncLimiter(self.tokens_per_minute, 60) if self.tokens_per_minute else None
+            entry = (limits, request_bucket, token_bucket)
+            self._loop_buckets[loop] = entry
+        return entry[1], entry[2]
+    
+    async def acquire(self, tokens: int = 0):
+        """
+        Wait until one more request fits within the limits
+        
+        Args:
+            tokens: Estimated tokens the request will use (prompt plus completion)
+        """
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        request_bucket, token_bucket = self._buckets()
+        await request_bucket.acquire()
+        if token_bucket is not None and tokens:
+            await token_bucket.acquire(min(tokens, token_bucket.max_rate))
+    
+    def pause(self, seconds: float):
+        """Hold back every request to this provider for the next few seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+    
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """
+        Follow the limits a provider reports in x-ratelimit-* response headers
+        
+        The buckets are resized to the advertised per-minute limits, and once a
+        limit is used up nothing more is sent until it resets.
+        """
+        for kind in ("requests", "tokens"):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            if limit and limit.isdigit() and int(limit) != getattr(self, f"{kind}_per_minute"):
+                setattr(self, f"{kind}_per_minute", int(limit))
+            
+            if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+                reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset:
+                    self.pause(reset)
+
+
+@functools.lru_cache(maxsize=None)
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """One limiter per provider, shared by every async call to it"""
+    return RateLimiter(settings.LLM_REQUESTS_PER_MINUTE, settings.LLM_TOKENS_PER_MINUTE)
@@ -0,0 +1,253 @@
+"""Semantic Cache - Reuses categories of near-duplicate emails"""
+import os
+import logging
+import functools
+import threading
+from typing import Dict, Any, Optional, Tuple, List
+from models.database import SemanticCacheModel
+from config.settings import settings
+
+try:
+    import numpy as np
+    import faiss
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    np = faiss = SentenceTransformer = None
+
+
+logger = logging.getLogger(__name__)
+
+# Above this many vectors the on-disk index is product-quantized (IVFPQ)
+_IVFPQ_MIN_VECTORS = 10000
+
+# New entries are merged into the on-disk index after this many additions
+_SAVE_EVERY = 256
+
+# Texts per forward pass when embedding many emails at once
+_ENCODE_BATCH_SIZE = 64
+
+# Nearest entries considered per lookup; the best one made with the current
+# categorization prompt wins
+_SEARCH_K = 8
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_model(model_name: str):
+    """Load a SentenceTransformer once per process; shared by everything that embeds text"""
+    return SentenceTransformer(model_name)
+
+
+def _flat_index(dim: int):
+    """Exact inner-product index; over normalized vectors this is cosine similarity"""
+    return faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+
+
+def _build_index(vectors, ids, dim: int):
+    """Build the index for the on-disk snapshot, quantized once it is large"""
+    if len(ids) <= _IVFPQ_MIN_VECTORS:
+        index = _flat_index(dim)
+    else:
+        quantizer = faiss.IndexFlatIP(dim)
+        nlist = int(4 * np.sqrt(len(ids)))
+        subquantizers = next(m for m in (48, 32, 24, 16, 8, 4, 2, 1) if dim % m == 0)
+        ivfpq = faiss.IndexIVFPQ(quantizer, dim, nlist, subquantizers, 8, faiss.METRIC_INNER_PRODUCT)
+        ivfpq.train(vectors)
+        ivfpq.nprobe = 16
+        index = faiss.IndexIDMap(ivfpq)
+    
+    if len(ids):
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+class SemanticCache:
+    """Embedding index over categorized emails, persisted in SQLite"""
+    
+    def __init__(self, enabled: bool = True, threshold: float = 0.92,
+                 model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 index_path: str = "data/semantic_cache.faiss"):
+        self.enabled = enabled and SentenceTransformer is not None
+        self.threshold = threshold
+        self.model_name = model_name
+        self.index_path = index_path
+        # Snapshot memory-mapped read-only from disk, plus entries added since
+        self._index = None
+        self._delta = None
+        # Entry ID -> (prompt_key, category)
+        self._categories: Dict[int, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def email_text(email_data: Dict[str, Any]) -> str:
+        """Text embedded for an email: sender, subject and the start of the body"""
+        return "\n".join([
+            email_data.get('sender') or '',
+            email_data.get('subject') or '',
+            (email_data.get('body') or '')[:512]
+        ])
+    
+    @property
+    def _model(self):
+        return get_embedding_model(self.model_name)
+    
+    def _encode(self, texts: List[str]):
+        """Normalized float32 embeddings, one row per text, in batched forward passes"""
+        return self._model.encode(
+            texts,
+            batch_size=_ENCODE_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ).astype(np.float32)
+    
+    def _ensure_loaded(self):
+        """Map the on-disk index and load entries added after it was written; rebuild it if it is stale"""
+        if self._index is not None:
+            return
+        
+        dim = self._model.get_sentence_embedding_dimension()
+        self._categories = SemanticCacheModel.get_categories()
+        
+        if os.path.exists(self.index_path):
+            self._index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            ids = faiss.vector_to_array(self._index.id_map)
+            last_id = int(ids.max()) if len(ids) else 0
+            
+            # The snapshot must hold exactly the rows up to its last ID; after the
+            # database was cleared or replaced it points at entries that are gone
+            if (sum(1 for entry_id in self._categories if entry_id <= last_id) != len(ids)
+                    or (len(ids) and last_id not in self._categories)):
+                logger.info("Semantic cache index %s does not match the database; rebuilding", self.index_path)
+                self._save()
+                return
+        else:
+            self._index = _flat_index(dim)
+            last_id = 0
+        
+        self._delta = _flat_index(dim)
+        entries = SemanticCacheModel.get_all(after_id=last_id)
+        if entries:
+            vectors = np.vstack([np.frombuffer(e['embedding'], dtype=np.float32) for e in entries])
+            self._delta.add_with_ids(vectors, np.array([e['id'] for e in entries], dtype=np.int64))
+        
+        if self._delta.ntotal >= _SAVE_EVERY or not os.path.exists(self.index_path):
+            self._save()
+    
+    def _save(self):
+        """Rebuild the on-disk index from SQLite and map it again"""
+        dim = self._model.get_sentence_embedding_dimension()
+        entries = SemanticCacheModel.get_all()
+        if entries:
+            vectors = np.vstack([np.frombuffer(e['embedding'], dtype=np.float32) for e in entries])
+        else:
+            vectors = np.zeros((0, dim), dtype=np.float32)
+        index = _build_index(vectors, np.array([e['id'] for e in entries], dtype=np.int64), dim)
+        
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, self.index_path)
+        
+        self._index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        self._delta = _flat_index(dim)
+    
+    def _search(self, embeddings) -> Tuple[Any, Any]:
+        """Nearest similarities and entry ids per embedding row (best first), across the snapshot and recent additions"""
+        results = [index.search(embeddings, min(_SEARCH_K, index.ntotal))
+                   for index in (self._index, self._delta) if index.ntotal]
+        if not results:
+            return (np.empty((len(embeddings), 0), dtype=np.float32),
+                    np.empty((len(embeddings), 0), dtype=np.int64))
+        
+        scores = np.hstack([scores for scores, _ in results])
+        ids = np.hstack([ids for _, ids in results])
+        order = np.argsort(-scores, axis=1)
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+    
+    def _match(self, scores, entry_ids, prompt_key: str) -> Optional[str]:
+        """Category of the most similar entry above the threshold that was made with this prompt"""
+        for score, entry_id in zip(scores, entry_ids):
+            if score < self.threshold:
+                break
+            entry = self._categories.get(int(entry_id))
+            if entry and entry[0] == prompt_key:
+                return entry[1]
+        return None
+    
+    def lookup(self, email_data: Dict[str, Any], prompt_key: str) -> Tuple[Optional[str], Any]:
+        """
+        Find the category of the most similar cached email
+        
+        Args:
+            email_data: Email dictionary with sender, subject, body
+            prompt_key: Identifies the categorization prompt; entries made
+                with any other prompt are ignored
+        
+        Returns:
+            Tuple of (category or None, embedding to pass to add() on a miss)
+        """
+        return self.lookup_many([email_data], prompt_key)[0]
+    
+    def lookup_many(self, emails: List[Dict[str, Any]], prompt_key: str) -> List[Tuple[Optional[str], Any]]:
+        """
+        lookup() for many emails, embedded in batches and searched together
+        
+        Args:
+            emails: Email dictionaries with sender, subject, body
+            prompt_key: Identifies the categorization prompt
+        
+        Returns:
+            One (category or None, embedding) tuple per email, in input order
+        """
+        if not self.enabled or not emails:
+            return [(None, None)] * len(emails)
+        
+        try:
+            with self._lock:
+                self._ensure_loaded()
+                embeddings = self._encode([self.email_text(email) for email in emails])
+                scores, entry_ids = self._search(embeddings)
+                
+                return [
+                    (self._match(scores[i], entry_ids[i], prompt_key), embeddings[i:i + 1])
+                    for i in range(len(emails))
+                ]
+        except Exception:
+            logger.exception("Error reading semantic cache")
+            return [(None, None)] * len(emails)
+    
+    def add(self, embedding: Any, category: str, prompt_key: str):
+        """Remember the category a prompt gave an embedding returned by lookup()"""
+        self.add_many([embedding], [category], prompt_key)
+    
+    def add_many(self, embeddings: List[Any], categories: List[str], prompt_key: str):
+        """Remember categories a prompt gave embeddings returned by lookup_many(), in one write"""
+        pairs = [(embedding, category) for embedding, category in zip(embeddings, categories)
+                 if embedding is not None]
+        if not self.enabled or not pairs:
+            return
+        
+        try:
+            with self._lock:
+                self._ensure_loaded()
+                vectors = np.vstack([embedding for embedding, _ in pairs])
+                entry_ids = SemanticCacheModel.insert_many([
+                    (vector.tobytes(), category, prompt_key) for vector, (_, category) in zip(vectors, pairs)
+                ])
+                self._delta.add_with_ids(vectors, np.array(entry_ids, dtype=np.int64))
+                self._categories.update((entry_id, (prompt_key, category))
+                                        for entry_id, (_, category) in zip(entry_ids, pairs))
+                
+                if self._delta.ntotal >= _SAVE_EVERY:
+                    self._save()
+        except Exception:
+            logger.exception("Error writing semantic cache")
+
+
+# Create singleton instance
+semantic_cache = SemanticCache(
+    enabled=settings.SEMANTIC_CACHE_ENABLED,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    model_name=settings.SEMANTIC_CACHE_MODEL,
+    index_path=settings.SEMANTIC_CACHE_INDEX_PATH
+)
@@ -0,0 +1,51 @@
+"""Shared fixtures: every test gets its own SQLite database"""
+import os
+import sys
+import tempfile
+import importlib
+import pytest
+
+# Settings are read at import time, so configure them before any app module loads
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "email_agent.db")
+os.environ.setdefault("LLM_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Database  # noqa: E402
+
+# services/__init__ re-exports the singletons under the module names, so look
+# the modules themselves up
+database_module = importlib.import_module("models.database")
+email_service_module = importlib.import_module("services.email_service")
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh database that every model and service uses for this test"""
+    database = Database(str(tmp_path / "test.db"))
+    for module in (database_module, email_service_module):
+        monkeypatch.setattr(module, "get_db", lambda: database)
+    
+    # Cached reads are keyed on a data version that restarts with each test
+    email_service_module._invalidate_cache()
+    yield database
+    email_service_module._invalidate_cache()
+    database.close()
+
+
+@pytest.fixture
+def make_email():
+    """Build an email dictionary; fields not given get distinct defaults"""
+    def _make(email_id: str, **fields):
+        return {
+            'id': email_id,
+            'sender': fields.get('sender', f"{email_id}@example.com"),
+            'subject': fields.get('subject', f"Subject {email_id}"),
+            'body': fields.get('body', f"Body of {email_id}"),
+            'timestamp': fields.get('timestamp', "2025-01-01T09:00:00"),
+            'category': fields.get('category', "Uncategorized")
+        }
+    return _make
@@ -0,0 +1,46 @@
+"""Tests for the shared connection and batched inserts"""
+import pytest
+from models.database import EmailModel
+
+
+def test_insert_many_skips_existing_ids(db, make_email):
+    """Only new emails are inserted and counted"""
+    assert EmailModel.insert_many([make_email("a"), make_email("b"), make_email("c")]) == 3
+    
+    # A repeated ID keeps the stored row rather than replacing it
+    inserted = EmailModel.insert_many([make_email("b", subject="Changed"), make_email("c"), make_email("d")])
+    
+    assert inserted == 1
+    assert sorted(email['id'] for email in EmailModel.get_all()) == ["a", "b", "c", "d"]
+    assert EmailModel.get_by_id("b")['subject'] == "Subject b"
+
+
+def test_insert_many_empty_batch(db):
+    """An empty batch inserts nothing"""
+    assert EmailModel.insert_many([]) == 0
+
+
+def test_connection_rolls_back_on_error(db, make_email):
+    """A write that fails inside connection() is undone and leaves no open transaction"""
+    with pytest.raises(RuntimeError):
+        with db.connection() as conn:
+            conn.execute(
+                "INSERT INTO emails (id, sender, subject, body, timestamp) VALUES (?, ?, ?, ?, ?)",
+                ("lost", "x@example.com", "Lost", "Body", "2025-01-01T09:00:00")
+            )
+            raise RuntimeError("write failed")
+    
+    with db.connection() as conn:
+        assert not conn.in_transaction
+    
+    # The next caller's commit must not carry the failed write with it
+    EmailModel.insert_many([make_email("kept")])
+    assert [email['id'] for email in EmailModel.get_all()] == ["kept"]
+
+
+def test_connection_is_shared(db):
+    """Every caller gets the same connection"""
+    with db.connection() as first:
+        pass
+    with db.connection() as second:
+        assert second is first
@@ -0,0 +1,61 @@
+"""Tests for email search on the FTS index and on the fallback scan"""
+import pytest
+from models.database import EmailModel
+from services.email_service import email_service
+
+
+@pytest.fixture
+def inbox(db, make_email):
+    EmailModel.insert_many([
+        make_email("budget", sender="finance@corp.com", subject="Quarterly budget review",
+                   body="Please send the figures by Friday."),
+        make_email("lunch", sender="alice@corp.com", subject="Team lunch", body="Pizza at noon?"),
+        make_email("news", sender="digest@news.com", subject="Weekly digest", body="Budget tips inside.")
+    ])
+    return db
+
+
+def _ids(results):
+    return sorted(email['id'] for email in results)
+
+
+@pytest.fixture(params=["fts", "scan"])
+def search_path(request, inbox):
+    """Run a search test once on the FTS index and once on the fallback scan"""
+    if request.param == "fts":
+        if not inbox.search_enabled:
+            pytest.skip("SQLite build lacks FTS5 trigram support")
+    else:
+        inbox._search_enabled = False
+    return request.param
+
+
+def test_search_all_fields(search_path):
+    """Matches in any field, case-insensitively"""
+    assert _ids(email_service.search_emails("budget")) == ["budget", "news"]
+
+
+def test_search_single_field(search_path):
+    """in_field limits the match to that field"""
+    assert _ids(email_service.search_emails("budget", "subject")) == ["budget"]
+    assert _ids(email_service.search_emails("corp.com", "sender")) == ["budget", "lunch"]
+
+
+def test_search_substring(search_path):
+    """Queries match inside words, not only whole words"""
+    assert _ids(email_service.search_emails("izz")) == ["lunch"]
+
+
+def test_search_no_match(search_path):
+    assert email_service.search_emails("invoice") == []
+
+
+def test_search_special_characters(search_path):
+    """FTS syntax and regex metacharacters in the query are matched literally"""
+    assert _ids(email_service.search_emails("noon?")) == ["lunch"]
+    assert email_service.search_emails('"budget" OR *') == []
+
+
+def test_short_query_uses_scan(inbox):
+    """Queries shorter than the trigram length are answered by the fallback scan"""
+    assert _ids(email_service.search_emails("pi")) == ["lunch"]
@@ -0,0 +1,106 @@
+"""Tests for processing the inbox against a stubbed LLM"""
+import pytest
+from models.database import EmailModel
+from services.email_service import email_service
+from services.processing_engine import processing_engine
+
+
+class StubLLM:
+    """Answers like the LLM service without calling a provider"""
+    
+    supports_batch = False
+    
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.categorized = []
+        self.extracted = []
+        self.closed = False
+    
+    def lookup_categories(self, emails, prompt_template):
+        return [(None, None)] * len(emails)
+    
+    async def acategorize_email(self, email, prompt_template, cached=None):
+        self.categorized.append(email['id'])
+        if email['id'] in self.fail_ids:
+            raise RuntimeError("provider error")
+        return "To-Do" if "please" in email['body'].lower() else "Newsletter"
+    
+    async def aextract_action_items(self, email, prompt_template):
+        self.extracted.append(email['id'])
+        return [{'task': "Send the figures", 'deadline': "Friday"}]
+    
+    async def aclose(self):
+        self.closed = True
+
+
+class StubPrompts:
+    @staticmethod
+    def get_prompt(prompt_type):
+        return f"{prompt_type} prompt"
+
+
+@pytest.fixture
+def engine(db, monkeypatch):
+    monkeypatch.setattr(processing_engine, "prompt_svc", StubPrompts())
+    return processing_engine
+
+
+def test_process_inbox(engine, monkeypatch, make_email):
+    """Every uncategorized email is categorized; actionable To-Dos get action items"""
+    llm = StubLLM()
+    monkeypatch.setattr(engine, "llm", llm)
+    EmailModel.insert_many([
+        make_email("todo", body="Please send the figures by Friday."),
+        make_email("news", body="This week's highlights."),
+        make_email("done", category="Important")
+    ])
+    
+    result = engine.process_inbox()
+    
+    assert result['success'] and result['errors'] == []
+    assert (result['processed'], result['total']) == (2, 2)
+    assert email_service.get_email_by_id("todo")['category'] == "To-Do"
+    assert email_service.get_email_by_id("news")['category'] == "Newsletter"
+    assert email_service.get_email_by_id("done")['category'] == "Important"
+    assert llm.extracted == ["todo"]
+    assert [item['task'] for item in email_service.get_action_items("todo")] == ["Send the figures"]
+    assert llm.closed
+
+
+def test_process_inbox_deduplicates_identical_emails(engine, monkeypatch, make_email):
+    """Identical emails are sent to the LLM once and the result applies to every copy"""
+    llm = StubLLM()
+    monkeypatch.setattr(engine, "llm", llm)
+    copy = {'sender': "digest@news.com", 'subject': "Weekly digest", 'body': "This week's highlights."}
+    EmailModel.insert_many([make_email("first", **copy), make_email("second", **copy)])
+    
+    result = engine.process_inbox()
+    
+    assert result['processed'] == 2
+    assert len(llm.categorized) == 1
+    assert {email_service.get_email_by_id(i)['category'] for i in ("first", "second")} == {"Newsletter"}
+
+
+def test_process_inbox_reports_failures(engine, monkeypatch, make_email):
+    """A failed email is reported and left uncategorized while the rest are saved"""
+    monkeypatch.setattr(engine, "llm", StubLLM(fail_ids={"bad"}))
+    EmailModel.insert_many([make_email("bad"), make_email("good")])
+    
+    result = engine.process_inbox()
+    
+    assert result['success']
+    assert len(result['errors']) == 1 and "bad" in result['errors'][0]
+    assert email_service.get_email_by_id("bad")['category'] == "Uncategorized"
+    assert email_service.get_email_by_id("good")['category'] == "Newsletter"
+
+
+def test_process_inbox_without_prompts(engine, monkeypatch):
+    """Processing stops before any LLM call when the prompts are missing"""
+    llm = StubLLM()
+    monkeypatch.setattr(engine, "llm", llm)
+    monkeypatch.setattr(engine.prompt_svc, "get_prompt", lambda prompt_type: None)
+    
+    result = engine.process_inbox()
+    
+    assert not result['success']
+    assert llm.categorized == []
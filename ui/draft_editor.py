@@ -3,6 +3,25 @@ import streamlit as st
 from models.database import DraftModel
 from services.email_service import email_service
 from utils.helpers import format_timestamp
+from utils.request_cache import rget
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_drafts():
+    """All drafts, cached across reruns until a draft changes"""
+    return DraftModel.get_all()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_draft(draft_id: int):
+    """A single draft, cached across reruns until a draft changes"""
+    return DraftModel.get_by_id(draft_id)
+
+
+def clear_draft_cache():
+    """Drop cached draft reads after a draft is created, edited or deleted"""
+    _load_drafts.clear()
+    _load_draft.clear()
 
 
 def render_draft_editor():
@@ -18,7 +37,7 @@ def render_draft_editor():
             st.rerun()
     
     # Get all drafts
-    drafts = DraftModel.get_all()
+    drafts = _load_drafts()
     
     if not drafts:
         st.info("📭 No drafts yet. Generate a reply from the Inbox Manager or use the Email Agent to create drafts.")
@@ -98,6 +117,7 @@ def render_new_draft_editor():
                     subject=subject,
                     body=body
                 )
+                clear_draft_cache()
                 
                 st.success("✅ Draft saved!")
                 st.session_state.selected_draft = draft_id
@@ -115,7 +135,7 @@ def render_new_draft_editor():
 def render_draft_detail(draft_id: int):
     """Render detailed view and editor for a draft"""
     
-    draft = DraftModel.get_by_id(draft_id)
+    draft = _load_draft(draft_id)
     
     if not draft:
         st.error("Draft not found")
@@ -125,7 +145,7 @@ def render_draft_detail(draft_id: int):
     
     # Link to original email if it's a reply
     if draft['email_id']:
-        original_email = email_service.get_email_by_id(draft['email_id'])
+        original_email = rget(email_service.get_email_by_id, draft['email_id'])
         if original_email:
             with st.container(border=True):
                 st.write("↩️ **In Reply To:**")
@@ -149,6 +169,7 @@ def render_draft_detail(draft_id: int):
             if st.button("💾 Save Changes", key=f"save_{draft_id}", use_container_width=True):
                 if new_subject.strip() and new_body.strip():
                     success = DraftModel.update(draft_id, new_subject, new_body)
+                    clear_draft_cache()
                     
                     if success:
                         st.success("✅ Draft updated!")
@@ -183,6 +204,7 @@ def render_draft_detail(draft_id: int):
             if st.button("🗑️ Delete Draft", key=f"delete_{draft_id}", use_container_width=True):
                 if st.session_state.get(f'confirm_delete_{draft_id}', False):
                     success = DraftModel.delete(draft_id)
+                    clear_draft_cache()
                     
                     if success:
                         st.success("✅ Draft deleted!")
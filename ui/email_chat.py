@@ -1,8 +1,16 @@
 """Email Agent Chat UI Component"""
+import re
+from typing import Iterator
 import streamlit as st
 from services.llm_service import llm_service
 from services.email_service import email_service
 from services.processing_engine import processing_engine
+from utils.request_cache import rget, clear_request_cache
+
+
+# Keywords that route a chat query to a canned handler, one named group per intent
+_INTENT_RE = re.compile(r"(?P<task>task|to-?do|action)|(?P<urgent>urgent|important)|(?P<draft>draft|reply)",
+                        re.IGNORECASE)
 
 
 def render_email_chat():
@@ -14,20 +22,11 @@ def render_email_chat():
             {"role": "assistant", "content": "How can I help you with your inbox today?"}
         ]
     
-    # Chat container
-    chat_container = st.container()
-    
-    # Display chat history
-    with chat_container:
-        for message in st.session_state.chat_history:
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
-    
     # Check if there's a context email
     context_email_id = st.session_state.get('chat_email_context')
     
     if context_email_id:
-        email = email_service.get_email_by_id(context_email_id)
+        email = rget(email_service.get_email_by_id, context_email_id)
         if email:
             with st.container(border=True):
                 st.write("📧 **Context Email:**")
@@ -46,8 +45,8 @@ def render_email_chat():
     with col1:
         if st.button("📊 Summarize Selected", use_container_width=True):
             if context_email_id:
-                add_user_message("Summarize this email")
-                handle_chat_query("Summarize this email", context_email_id)
+                # Answered by the chat panel, so the reply streams into the chat
+                st.session_state.pending_chat_query = "Summarize this email"
             else:
                 st.warning("⚠️ Please select an email first")
     
@@ -63,25 +62,44 @@ def render_email_chat():
     
     st.divider()
     
-    # Chat messages display
-    chat_container = st.container(height=400)
+    _chat_panel(context_email_id)
+
+
+@st.fragment
+def _chat_panel(context_email_id: str = None):
+    """Chat history and input; sending a message reruns only this panel, not the whole app"""
+    # A fragment rerun skips main(), so start it with a fresh memo too
+    clear_request_cache()
     
-    with chat_container:
-        for message in st.session_state.chat_history:
-            if message['role'] == 'user':
-                with st.chat_message("user"):
-                    st.write(message['content'])
-            else:
-                with st.chat_message("assistant"):
-                    st.write(message['content'])
+    # Chat messages display; created ahead of the input so it sits above it
+    chat_container = st.container(height=400)
     
-    # Chat input
-    user_input = st.chat_input("Type your question here...")
+    # Chat input, or a question sent from a quick action; blank input is ignored
+    user_input = (st.chat_input("Type your question here...")
+                  or st.session_state.pop('pending_chat_query', None) or "").strip()
     
-    if user_input:
-        add_user_message(user_input)
-        handle_chat_query(user_input, context_email_id)
-        st.rerun()
+    with chat_container:
+        history = st.session_state.chat_history
+        for message in history:
+            render_message(message)
+        
+        if user_input:
+            # Draw the new exchange as it happens, without another rerun: the
+            # question first, then the reply (LLM replies stream in before
+            # they are stored)
+            add_user_message(user_input)
+            render_message(history[-1])
+            
+            shown = len(history)
+            handle_chat_query(user_input, context_email_id)
+            for message in history[shown:]:
+                render_message(message)
+
+
+def render_message(message: dict):
+    """Render one chat history message"""
+    with st.chat_message("user" if message['role'] == 'user' else "assistant"):
+        st.write(message['content'])
 
 
 def add_user_message(content: str):
@@ -100,17 +118,33 @@ def add_assistant_message(content: str):
     })
 
 
+def stream_assistant_message(chunks: Iterator[str]):
+    """Show a reply as it is generated, then add it to the chat history"""
+    preview = st.empty()
+    with preview.container():
+        with st.chat_message("assistant"):
+            content = st.write_stream(chunks)
+    
+    # The panel renders the finished message along with the rest of the history
+    preview.empty()
+    add_assistant_message(content if isinstance(content, str) else "".join(map(str, content)))
+
+
 def handle_chat_query(query: str, email_id: str = None):
     """Handle a chat query from the user"""
+    query = query.strip()
+    if not query:
+        return
     
-    query_lower = query.lower()
+    # Every intent mentioned, in one scan; tasks win over urgent, urgent over drafts
+    intents = {match.lastgroup for match in _INTENT_RE.finditer(query)}
     
     # Check for specific query types
-    if "task" in query_lower or "to-do" in query_lower or "action" in query_lower:
+    if "task" in intents:
         handle_tasks_query()
-    elif "urgent" in query_lower or "important" in query_lower:
+    elif "urgent" in intents:
         handle_urgent_query()
-    elif "draft" in query_lower or "reply" in query_lower:
+    elif "draft" in intents:
         handle_draft_query(email_id)
     elif email_id:
         # General query about a specific email
@@ -128,34 +162,38 @@ def handle_tasks_query():
         add_assistant_message("You have no pending tasks! 🎉")
         return
     
-    response = f"You have **{len(action_items)} pending tasks:**\n\n"
+    parts = [f"You have **{len(action_items)} pending tasks:**\n\n"]
+    
+    # One lookup for every task's email instead of a query per task
+    emails_by_id = email_service.get_emails_by_ids([item['email_id'] for item in action_items])
     
     for item in action_items:
-        email = email_service.get_email_by_id(item['email_id'])
+        email = emails_by_id.get(item['email_id'])
         email_subject = email['subject'] if email else "Unknown"
         
-        response += f"• **{item['task']}**\n"
-        response += f"  📅 Deadline: {item['deadline']}\n"
-        response += f"  📧 From email: {email_subject}\n\n"
+        parts.append(
+            f"• **{item['task']}**\n"
+            f"  📅 Deadline: {item['deadline']}\n"
+            f"  📧 From email: {email_subject}\n\n"
+        )
     
-    add_assistant_message(response)
+    add_assistant_message("".join(parts))
 
 
 def handle_urgent_query():
     """Handle query about urgent/important emails"""
-    important_emails = email_service.get_all_emails(category_filter="Important")
+    important_emails = rget(email_service.get_all_emails, "Important")
     
     if not important_emails:
         add_assistant_message("No urgent emails at the moment! ✅")
         return
     
-    response = f"You have **{len(important_emails)} important emails:**\n\n"
+    parts = [f"You have **{len(important_emails)} important emails:**\n\n"]
     
     for email in important_emails[:10]:  # Limit to 10
-        response += f"📧 **{email['subject']}**\n"
-        response += f"   From: {email['sender']}\n\n"
+        parts.append(f"📧 **{email['subject']}**\n   From: {email['sender']}\n\n")
     
-    add_assistant_message(response)
+    add_assistant_message("".join(parts))
 
 
 def handle_draft_query(email_id: str = None):
@@ -178,7 +216,7 @@ def handle_draft_query(email_id: str = None):
 
 def handle_email_query(query: str, email_id: str):
     """Handle a query about a specific email"""
-    email = email_service.get_email_by_id(email_id)
+    email = rget(email_service.get_email_by_id, email_id)
     
     if not email:
         add_assistant_message("❌ Email not found.")
@@ -190,28 +228,14 @@ def handle_email_query(query: str, email_id: str):
     context += f"Body:\n{email['body']}"
     
     # Query LLM
-    response = llm_service.handle_chat_query(query, context)
-    
-    add_assistant_message(response)
+    stream_assistant_message(llm_service.handle_chat_query_stream(query, context))
 
 
 def handle_general_query(query: str):
     """Handle a general query about the inbox"""
     
-    # Get some context about the inbox
-    all_emails = email_service.get_all_emails()
-    stats = email_service.get_category_stats()
-    
-    context = f"Inbox summary:\n"
-    context += f"Total emails: {len(all_emails)}\n"
-    context += f"Categories: {stats}\n\n"
-    
-    # Add summary of recent emails
-    context += "Recent emails:\n"
-    for email in all_emails[:5]:
-        context += f"- {email['subject']} from {email['sender']}\n"
+    # Get some context about the inbox (cached until the inbox changes)
+    context = email_service.get_inbox_digest()
     
     # Query LLM
-    response = llm_service.handle_chat_query(query, context)
-    
-    add_assistant_message(response)
+    stream_assistant_message(llm_service.handle_chat_query_stream(query, context))
@@ -1,8 +1,23 @@
 """Email List UI Component"""
+import functools
 import streamlit as st
+from config.settings import settings
 from services.email_service import email_service
+from services.llm_service import llm_service
 from services.processing_engine import processing_engine
+from ui.draft_editor import clear_draft_cache
 from utils.helpers import format_timestamp, get_category_emoji, truncate_text
+from utils.request_cache import rget
+
+
+@functools.lru_cache(maxsize=4096)
+def _row_strings(subject: str, category: str, sender: str, timestamp: str):
+    """Button label and caption for an inbox row, formatted once per distinct row"""
+    return (
+        f"{get_category_emoji(category)} **{truncate_text(subject, 35)}**",
+        f"{sender} • {format_timestamp(timestamp)}"
+    )
+
 
 def render_email_list():
     """Render the email list view"""
@@ -17,10 +32,28 @@ def render_email_list():
                 st.session_state.emails_loaded = True
                 st.rerun()
         
+        # The Batch API costs half as much but holds this run until the provider
+        # finishes, which can take hours, so it is only used when asked for
+        use_batch_api = False
+        if llm_service.supports_batch:
+            use_batch_api = st.checkbox(
+                "Use Batch API",
+                value=settings.LLM_USE_BATCH_API,
+                help="Half the cost, but processing can take up to 24 hours"
+            )
+        
         if st.button("⚡ Process Emails", type="primary", use_container_width=True):
-            with st.spinner("Processing..."):
-                processing_engine.process_inbox()
-                st.rerun()
+            # The Batch API reports progress while it polls
+            with st.status("Processing...", expanded=True) as status:
+                progress = st.progress(0.0)
+                
+                def show_progress(current, total, message):
+                    progress.progress(current / total if total else 1.0, text=message)
+                
+                result = processing_engine.process_inbox(progress_callback=show_progress,
+                                                         use_batch_api=use_batch_api)
+                status.update(label=result['message'], state="complete" if result['success'] else "error")
+            st.rerun()
         
         st.divider()
         
@@ -33,7 +66,7 @@ def render_email_list():
 
     # Get emails
     filter_val = None if category_filter == "All" else category_filter
-    emails = email_service.get_all_emails(filter_val)
+    emails = rget(email_service.get_all_emails_summary, filter_val)
     
     if not emails:
         st.info("No emails found. Click 'Refresh Inbox' to load data.")
@@ -49,23 +82,28 @@ def render_email_list():
         # Email list
         for email in emails:
             with st.container():
+                label, caption = _row_strings(email['subject'], email['category'], email['sender'], email['timestamp'])
+                
                 # Email subject as button
-                label = f"{get_category_emoji(email['category'])} **{truncate_text(email['subject'], 35)}**"
                 if st.button(
                     label,
                     key=f"email_{email['id']}",
                     use_container_width=True
                 ):
-                    st.session_state.selected_email = email
+                    # Keep only the ID in session state; the detail view loads the full email
+                    st.session_state.selected_email_id = email['id']
                     st.rerun()
                 
                 # Metadata
-                st.caption(f"{email['sender']} • {format_timestamp(email['timestamp'])}")
+                st.caption(caption)
                 st.divider()
     
     with col2:
-        if st.session_state.selected_email:
-            render_email_detail(st.session_state.selected_email)
+        # Cached per data version, so this reflects reprocessing without a DB read per rerun
+        selected = (rget(email_service.get_email_by_id, st.session_state.selected_email_id)
+                    if st.session_state.selected_email_id else None)
+        if selected:
+            render_email_detail(selected)
         else:
             st.info("Select an email to view details")
 
@@ -79,7 +117,7 @@ def render_email_detail(email):
         st.subheader(email['subject'])
     with c2:
         if st.button("✕ Close"):
-            st.session_state.selected_email = None
+            st.session_state.selected_email_id = None
             st.rerun()
     
     # Metadata
@@ -99,14 +137,24 @@ def render_email_detail(email):
     ac1, ac2 = st.columns(2)
     with ac1:
         if st.button("📝 Draft Reply", use_container_width=True):
-            with st.spinner("Drafting..."):
-                draft = processing_engine.generate_draft(email['id'])
-                if draft:
-                    st.session_state.selected_draft = draft['id']
-                    st.session_state.active_tab = 2 # Switch to Drafts tab
-                    st.rerun()
+            # Show the reply as it is generated instead of blocking on a spinner
+            preview = st.empty()
+            chunks = []
+            
+            def show_chunk(chunk):
+                chunks.append(chunk)
+                preview.markdown("".join(chunks) + "▌")
+            
+            draft = processing_engine.generate_draft(email['id'], on_chunk=show_chunk)
+            preview.empty()
+            if draft:
+                clear_draft_cache()
+                st.session_state.selected_draft = draft['id']
+                st.session_state.active_tab = 2 # Switch to Drafts tab
+                st.rerun()
     
     with ac2:
         if st.button("🔄 Reprocess", use_container_width=True):
-            processing_engine.process_email(email['id'])
+            # Ask the LLM again rather than repeating a cached answer
+            processing_engine.process_email(email['id'], use_cache=False)
             st.rerun()
@@ -4,6 +4,13 @@ from services.prompt_service import prompt_service
 from services.processing_engine import processing_engine
 
 
+@st.cache_resource(show_spinner=False)
+def _load_prompts_bundle():
+    """Load the prompts once and share them across reruns until a prompt is edited"""
+    success, message = prompt_service.ensure_prompts_loaded()
+    return success, message, prompt_service.get_all_prompts() if success else {}
+
+
 def render_prompt_config():
     """Render the prompt configuration view"""
     
@@ -11,12 +18,13 @@ def render_prompt_config():
     st.caption("Customize how the assistant processes your emails.")
     
     # Ensure prompts are loaded
-    success, message = prompt_service.ensure_prompts_loaded()
+    success, message, prompts = _load_prompts_bundle()
     
     if not success:
         st.error(f"❌ {message}")
         if st.button("📥 Load Default Prompts"):
             success, msg = prompt_service.load_default_prompts()
+            _load_prompts_bundle.clear()
             if success:
                 st.success(f"✅ {msg}")
                 st.rerun()
@@ -24,9 +32,6 @@ def render_prompt_config():
                 st.error(f"❌ {msg}")
         return
     
-    # Get all prompts
-    prompts = prompt_service.get_all_prompts()
-    
     # Create tabs for each prompt type
     tab1, tab2, tab3 = st.tabs([
         "📊 Categorization",
@@ -81,11 +86,13 @@ def render_prompt_editor(prompt_type: str, title: str, current_content: str, des
         if st.button("💾 Save Changes", key=f"save_{prompt_type}", use_container_width=True):
             if edited_content.strip():
                 success = prompt_service.update_prompt(prompt_type, edited_content)
+                _load_prompts_bundle.clear()
                 if success:
                     st.success("✅ Prompt saved successfully!")
                 else:
                     # Try creating if update failed
                     prompt_service.create_prompt(prompt_type, edited_content)
+                    _load_prompts_bundle.clear()
                     st.success("✅ Prompt created successfully!")
             else:
                 st.error("❌ Prompt content cannot be empty")
@@ -94,6 +101,7 @@ def render_prompt_editor(prompt_type: str, title: str, current_content: str, des
         if st.button("🔄 Reset to Default", key=f"reset_{prompt_type}", use_container_width=True):
             # Reload default prompts
             prompt_service.load_default_prompts()
+            _load_prompts_bundle.clear()
             st.success("✅ Reset to default prompt")
             st.rerun()
     
@@ -126,6 +134,7 @@ def render_prompt_editor(prompt_type: str, title: str, current_content: str, des
             with st.spinner("Testing prompt..."):
                 # First save the edited prompt
                 prompt_service.update_prompt(prompt_type, edited_content)
+                _load_prompts_bundle.clear()
                 
                 # Test it
                 result = processing_engine.test_prompt(prompt_type, sample_email)
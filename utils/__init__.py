@@ -1,4 +1,8 @@
 """Utils package"""
 from utils.helpers import truncate_text, format_timestamp, get_category_color, get_category_emoji
+from utils.caching import cache_data, cache_resource
+from utils.log import setup_logging
+from utils.request_cache import rget, clear_request_cache
+from utils.token_utils import count_tokens, truncate_to_tokens
 
-__all__ = ['truncate_text', 'format_timestamp', 'get_category_color', 'get_category_emoji']
+__all__ = ['truncate_text', 'format_timestamp', 'get_category_color', 'get_category_emoji', 'cache_data', 'cache_resource', 'setup_logging', 'count_tokens', 'truncate_to_tokens', 'rget', 'clear_request_cache']
@@ -0,0 +1,60 @@
+"""Caching helpers that use Streamlit's caches when running under Streamlit"""
+import functools
+
+try:
+    import streamlit as st
+    from streamlit import runtime
+except ImportError:
+    st = runtime = None
+
+
+def _in_streamlit() -> bool:
+    """Whether a Streamlit app is running (not just importable, as in setup.py or scripts)"""
+    return runtime is not None and runtime.exists()
+
+
+def _dispatch(f, make_streamlit_cached, fallback):
+    """
+    Route each call to Streamlit's cache inside a running app, and to fallback elsewhere
+
+    The Streamlit cache is only created on the first call inside the app;
+    creating it without a runtime logs a warning.
+    """
+    if st is None:
+        return fallback
+
+    streamlit_cached = None
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        nonlocal streamlit_cached
+        if not _in_streamlit():
+            return fallback(*args, **kwargs)
+        if streamlit_cached is None:
+            streamlit_cached = make_streamlit_cached()
+        return streamlit_cached(*args, **kwargs)
+
+    return wrapper
+
+
+def cache_data(func=None, *, max_entries: int = 32):
+    """Cache return values; st.cache_data under Streamlit, lru_cache elsewhere"""
+    def decorator(f):
+        return _dispatch(
+            f,
+            lambda: st.cache_data(max_entries=max_entries, show_spinner=False)(f),
+            functools.lru_cache(maxsize=max_entries)(f)
+        )
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def cache_resource(func):
+    """Share one instance per process; st.cache_resource under Streamlit, lru_cache elsewhere"""
+    return _dispatch(
+        func,
+        lambda: st.cache_resource(show_spinner=False)(func),
+        functools.lru_cache(maxsize=None)(func)
+    )
@@ -1,41 +1,67 @@
 """Utility functions"""
+import functools
+from datetime import datetime
 
+try:
+    from ciso8601 import parse_datetime
+except ImportError:
+    parse_datetime = None
+
+
+# Month abbreviations for format_timestamp, which builds the string itself rather than using strftime
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _parse_iso(timestamp: str) -> datetime:
+    """Parse an ISO 8601 timestamp, with ciso8601's C parser when it is installed"""
+    if parse_datetime is not None:
+        return parse_datetime(timestamp)
+    if timestamp.endswith('Z'):
+        timestamp = timestamp[:-1] + '+00:00'
+    return datetime.fromisoformat(timestamp)
+
+
+@functools.lru_cache(maxsize=2048)
 def truncate_text(text: str, max_length: int = 100) -> str:
-    """Truncate text to max_length characters"""
-    if len(text) <= max_length:
-        return text
-    return text[:max_length] + "..."
+    """Truncate text to max_length characters (memoized; list labels repeat on every rerun)"""
+    return text if len(text) <= max_length else text[:max_length] + "..."
 
 
+@functools.lru_cache(maxsize=4096)
 def format_timestamp(timestamp: str) -> str:
-    """Format ISO timestamp to readable format"""
-    from datetime import datetime
+    """Format ISO timestamp to readable format (memoized; the same timestamps are shown on every rerun)"""
     try:
-        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-        return dt.strftime("%b %d, %Y %I:%M %p")
+        dt = _parse_iso(timestamp)
+        # Same output as strftime("%b %d, %Y %I:%M %p")
+        return (f"{_MONTHS[dt.month - 1]} {dt.day:02d}, {dt.year} "
+                f"{(dt.hour - 1) % 12 + 1:02d}:{dt.minute:02d} {'AM' if dt.hour < 12 else 'PM'}")
     except:
         return timestamp
 
 
+# Badge color and emoji per category
+_CATEGORY_COLORS = {
+    "Important": "red",
+    "To-Do": "orange",
+    "Newsletter": "blue",
+    "Spam": "gray",
+    "Uncategorized": "lightgray"
+}
+
+_CATEGORY_EMOJIS = {
+    "Important": "🔴",
+    "To-Do": "📋",
+    "Newsletter": "📰",
+    "Spam": "🗑️",
+    "Uncategorized": "❓"
+}
+
+
 def get_category_color(category: str) -> str:
     """Get color for category badge"""
-    colors = {
-        "Important": "red",
-        "To-Do": "orange",
-        "Newsletter": "blue",
-        "Spam": "gray",
-        "Uncategorized": "lightgray"
-    }
-    return colors.get(category, "lightgray")
+    return _CATEGORY_COLORS.get(category, "lightgray")
 
 
 def get_category_emoji(category: str) -> str:
     """Get emoji for category"""
-    emojis = {
-        "Important": "🔴",
-        "To-Do": "📋",
-        "Newsletter": "📰",
-        "Spam": "🗑️",
-        "Uncategorized": "❓"
-    }
-    return emojis.get(category, "📧")
+    return _CATEGORY_EMOJIS.get(category, "📧")
@@ -0,0 +1,30 @@
+"""Logging setup that keeps log I/O off the calling thread"""
+import atexit
+import queue
+import logging
+import logging.handlers
+
+
+def setup_logging(level: str = "INFO") -> logging.handlers.QueueListener:
+    """
+    Route the root logger through a queue drained by a background listener
+    
+    Records are only enqueued on the calling thread (event loop included);
+    formatting and writing to stderr happen on the listener's thread.
+    
+    Returns:
+        The running listener, stopped automatically at exit
+    """
+    log_queue = queue.SimpleQueue()
+    
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level.upper())
+    
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
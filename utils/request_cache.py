@@ -0,0 +1,36 @@
+"""Per-rerun memo for data lookups repeated across UI components"""
+from typing import Any, Callable
+
+try:
+    import streamlit as st
+except ImportError:
+    st = None
+
+
+_SESSION_KEY = "_req_cache"
+
+
+def rget(fn: Callable[..., Any], *args) -> Any:
+    """
+    Call fn(*args) at most once per script run
+    
+    Components rendered in the same rerun often look up the same email; the
+    first call's result is shared by the rest. Results must not be mutated.
+    
+    Returns:
+        fn's return value for these arguments
+    """
+    if st is None:
+        return fn(*args)
+    
+    memo = st.session_state.setdefault(_SESSION_KEY, {})
+    key = (fn.__module__, fn.__qualname__, args)
+    if key not in memo:
+        memo[key] = fn(*args)
+    return memo[key]
+
+
+def clear_request_cache():
+    """Forget memoized results; call at the start of every script run (fragments included)"""
+    if st is not None:
+        st.session_state.pop(_SESSION_KEY, None)
@@ -0,0 +1,64 @@
+"""Token counting and truncation for LLM prompts"""
+import functools
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# Rough characters per token when no tokenizer is available
+_CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model_name: Optional[str] = None):
+    """
+    Tokenizer for a model, loaded once per model
+    
+    Non-OpenAI models get o200k_base, which is close enough for budgeting.
+    
+    Returns:
+        tiktoken Encoding, or None if tiktoken (or its vocabulary) is unavailable
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name or "")
+    except KeyError:
+        pass
+    except Exception:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """Number of tokens in text (estimated from its length without tiktoken)"""
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: Optional[str] = None) -> str:
+    """Cut text down to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return text[:max_tokens * _CHARS_PER_TOKEN]
+    
+    # Every token covers at least one UTF-8 byte, so text with no more bytes
+    # than the limit always fits (characters are no bound: CJK can be 2+ tokens)
+    if len(text.encode('utf-8')) <= max_tokens:
+        return text
+    
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])